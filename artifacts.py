@@ -0,0 +1,84 @@
+"""On disk cache of the word lists and frequency tables a solver builds in its constructor.
+
+Building the lists means scanning the NLTK corpora, lemmatizing every candidate and reading
+several CSVs, which takes seconds. The derived tables are saved once as a small JSON file keyed
+by the solver class, its constructor parameters and hashes of the data files and code that
+produced them, and later constructions load that file instead.
+"""
+import hashlib
+import inspect
+import json
+import os
+
+import exclusions
+
+ARTIFACT_VERSION = 1
+
+
+def file_hash(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def artifact_key(solver):
+    """hash of everything that determines the derived word tables of this solver"""
+    cls = type(solver)
+    code_files = {inspect.getfile(x) for x in cls.__mro__ if x is not object}
+    code_files.add(exclusions.__file__)
+    try:
+        import nltk
+
+        nltk_version = nltk.__version__
+    except ImportError:
+        nltk_version = None
+    description = {
+        'version': ARTIFACT_VERSION,
+        'class': f'{cls.__module__}.{cls.__qualname__}',
+        'params': solver.artifact_params(),
+        'nltk': nltk_version,
+        'sources': {
+            x: file_hash(x) if os.path.exists(x) else None for x in sorted(solver.source_files)
+        },
+        'code': {os.path.basename(x): file_hash(x) for x in sorted(code_files)},
+    }
+    return hashlib.sha1(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def artifact_path(solver, cache_dir):
+    return os.path.join(cache_dir, f'words_{type(solver).__name__}_{artifact_key(solver)}.json')
+
+
+def save_artifact(solver, cache_dir):
+    path = artifact_path(solver, cache_dir)
+    data = {
+        'short_words': solver.short_words,
+        'target_words': solver.target_words,
+        'score_dict': solver.score_dict,
+        # json object keys have to be strings
+        'placement_counter': [solver.placement_counter[i] for i in sorted(solver.placement_counter)],
+        'commonality': {key: int(val) for key, val in solver.commonality.items()},
+    }
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_artifact(solver, cache_dir):
+    """set the solver's word tables from its cached artifact, returning False if there isn't one"""
+    path = artifact_path(solver, cache_dir)
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        data = json.load(f)
+    solver.short_words = data['short_words']
+    solver.target_words = data['target_words']
+    solver.score_dict = data['score_dict']
+    solver.placement_counter = dict(enumerate(data['placement_counter']))
+    solver.commonality = data['commonality']
+    return True
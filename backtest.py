@@ -0,0 +1,403 @@
+"""Play a solver against a list of known answers in parallel, streaming one JSON line per game.
+
+Results are appended to the output file as each game finishes, so an interrupted run can be
+restarted with the same arguments and only the answers that aren't in the file yet are played.
+
+    python backtest.py WordNetWordle2 wordle_answers.txt --initial-guess raise --output wnw2.jsonl
+
+With --cutoffs, a solver with a cutoff method (WordleR) is loaded once per worker at the largest
+cutoff and every smaller one is cut from it, so a sweep over target list sizes shares the word
+list and feedback codes instead of running a cold backtest per size.
+
+    python backtest.py WordleR wordle_answers.txt --initial-guess raise --cutoffs 500,1000,2000
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+
+import pandas as pd
+
+import wordle
+from decision_cache import DecisionCache
+from game_trace import TraceRecorder
+from metrics import Metrics
+
+_solver = None
+# the worker's solver cut to each cutoff of a sweep
+_cutoff_solvers = {}
+
+# config fields added since the first result files, with the value older lines were run with
+CONFIG_DEFAULTS = {'hard_mode': False, 'settings': {}}
+
+
+def read_answers(path):
+    return pd.read_csv(path, header=None)[0].astype(str).str.strip().str.lower().tolist()
+
+
+def with_defaults(solver_kwargs):
+    """backtests default to quiet solvers that leave out the words added for live play"""
+    return {'log_level': 'WARNING', 'backtest': True, **(solver_kwargs or {})}
+
+
+def run_config(solver_name, initial_guess, solver_kwargs, hard_mode=False, settings=None):
+    """the fields that identify which run a result line belongs to, settings being solver
+    attributes set after construction (see compare.py)"""
+    return {
+        'solver': solver_name,
+        'initial_guess': initial_guess,
+        'solver_kwargs': solver_kwargs,
+        'hard_mode': hard_mode,
+        'settings': settings or {},
+    }
+
+
+def load_results(path, config=None):
+    """all result lines in the file as a DataFrame, optionally only those from the given run"""
+    records = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # a line cut short by an interrupted run, that game will be replayed
+                    continue
+                if config is None or all(
+                    record.get(k, CONFIG_DEFAULTS.get(k)) == v for k, v in config.items()
+                ):
+                    records.append(record)
+    return pd.DataFrame(records)
+
+
+def _init_worker(
+    solver_name, solver_kwargs, hard_mode, solver_workers, decision_cache, metrics, trace
+):
+    global _solver
+    _solver = getattr(wordle, solver_name)(**solver_kwargs)
+    configure(
+        _solver,
+        hard_mode,
+        solver_workers,
+        DecisionCache.load(decision_cache) if decision_cache else None,
+        metrics,
+        trace,
+    )
+
+
+def configure(solver, hard_mode, solver_workers, decision_cache, metrics, trace):
+    """set up a worker's solver for the run, decision_cache being a loaded DecisionCache"""
+    # not every solver's constructor takes hard_mode
+    solver.hard_mode = hard_mode
+    if solver_workers:
+        solver.max_workers = solver_workers
+    if decision_cache is not None:
+        solver.decision_cache = decision_cache
+    if metrics:
+        solver.metrics = Metrics()
+    if trace:
+        solver.trace = TraceRecorder()
+
+
+def _init_sweep_worker(solver_name, solver_kwargs, cutoffs, *args):
+    """_init_worker at the largest cutoff, then the solver for each cutoff from that one"""
+    _init_worker(solver_name, {**solver_kwargs, 'n': max(cutoffs)}, *args)
+    _cutoff_solvers.update({n: _solver.cutoff(n) for n in cutoffs})
+
+
+def play_cutoff(n, answer, initial_guess):
+    """play_with the worker's solver for cutoff n"""
+    return play_with(_cutoff_solvers[n], answer, initial_guess)
+
+
+def play_one(answer, initial_guess):
+    return play_with(_solver, answer, initial_guess)
+
+
+def play_with(solver, answer, initial_guess):
+    """play a single game with solver and return its result line"""
+    start = time.perf_counter()
+    record = {'answer': answer}
+    cache = solver.decision_cache
+    if cache is not None:
+        hits, misses = cache.hits, cache.misses
+    try:
+        score, _, _, luck, guesses = solver.play_game(answer, force_init_guess=initial_guess)
+    except AssertionError as e:
+        record.update({'score': None, 'error': str(e)})
+    else:
+        record.update(
+            {
+                'score': score,
+                'guesses': guesses,
+                'word_list_length': solver.word_list_length,
+                'luck': luck,
+            }
+        )
+    record['seconds'] = time.perf_counter() - start
+    if cache is not None:
+        record['cache_hits'] = cache.hits - hits
+        record['cache_misses'] = cache.misses - misses
+        # handed back to the parent process to merge into the saved cache, not written out
+        record['new_decisions'] = cache.drain_new_entries()
+    if solver.metrics is not None:
+        # also handed back to the parent process, for the metrics file
+        record['metrics'] = solver.metrics.drain()
+    if solver.trace is not None:
+        # the game's compressed trace frame, written to the trace file by the parent process
+        record['trace'] = solver.trace.drain()
+    return record
+
+
+def run_backtest(
+    solver_name,
+    answers,
+    output,
+    initial_guess=None,
+    solver_kwargs=None,
+    max_workers=None,
+    solver_workers=None,
+    decision_cache=None,
+    metrics=None,
+    trace=None,
+    hard_mode=False,
+):
+    """Play every answer not already recorded in output for this run configuration, appending
+    a result line as each game finishes. Returns the number of games played.
+
+    With decision_cache (a file path) each worker starts from the decisions saved there, and
+    every decision computed during the run is merged back into it at the end. With metrics (a
+    file path) the per round and per game records of metrics.Metrics are appended to it, and
+    with trace (a file path) a game_trace frame for each game. hard_mode runs are recorded
+    separately from the others."""
+    solver_kwargs = with_defaults(solver_kwargs)
+    config = run_config(solver_name, initial_guess, solver_kwargs, hard_mode)
+    todo = [(config, (x, initial_guess)) for x in remaining_answers(output, config, answers)]
+    return play_all(
+        play_one,
+        todo,
+        output,
+        _init_worker,
+        (solver_name, solver_kwargs, hard_mode, solver_workers, decision_cache, metrics, trace),
+        max_workers,
+        decision_cache,
+        metrics,
+        trace,
+    )
+
+
+def run_sweep(
+    solver_name,
+    answers,
+    output,
+    cutoffs,
+    initial_guess=None,
+    solver_kwargs=None,
+    max_workers=None,
+    solver_workers=None,
+    decision_cache=None,
+    metrics=None,
+    trace=None,
+    hard_mode=False,
+):
+    """run_backtest for each of the target list sizes in cutoffs, the solver's n, with one
+    solver per worker loaded at the largest. Result lines are the same as run_backtest's with
+    that n, so a sweep picks up where separate backtests (or an interrupted sweep) left off.
+    Returns the number of games played."""
+    solver_kwargs = with_defaults(solver_kwargs)
+    cutoffs = sorted(set(cutoffs))
+    todo = []
+    for n in cutoffs:
+        config = run_config(solver_name, initial_guess, {**solver_kwargs, 'n': n}, hard_mode)
+        todo.extend(
+            (config, (n, x, initial_guess)) for x in remaining_answers(output, config, answers)
+        )
+    return play_all(
+        play_cutoff,
+        todo,
+        output,
+        _init_sweep_worker,
+        (
+            solver_name,
+            solver_kwargs,
+            cutoffs,
+            hard_mode,
+            solver_workers,
+            decision_cache,
+            metrics,
+            trace,
+        ),
+        max_workers,
+        decision_cache,
+        metrics,
+        trace,
+    )
+
+
+def remaining_answers(output, config, answers):
+    """the answers without a result line for config in output yet"""
+    done = load_results(output, config)
+    done = set(done['answer']) if len(done) else set()
+    return [x for x in dict.fromkeys(answers) if x not in done]
+
+
+def end_last_line(output):
+    """start a fresh line after an interrupted write to output"""
+    if os.path.exists(output) and os.path.getsize(output):
+        with open(output, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            cut_short = f.read() != b'\n'
+        if cut_short:
+            with open(output, 'a') as f:
+                f.write('\n')
+
+
+def play_all(
+    play, todo, output, initializer, initargs, max_workers, decision_cache, metrics, trace
+):
+    """Call play(*args) for each (config, args) in todo across a process pool started with
+    initializer, appending each game's result line for config to output as it finishes."""
+    if not todo:
+        return 0
+    if decision_cache:
+        merged_cache = DecisionCache.load(decision_cache)
+    end_last_line(output)
+    with (
+        ProcessPoolExecutor(
+            max_workers=max_workers, initializer=initializer, initargs=initargs
+        ) as executor,
+        open(output, 'a') as f,
+        open(metrics or os.devnull, 'a') as metrics_file,
+        open(trace or os.devnull, 'ab') as trace_file,
+    ):
+        futures = {executor.submit(play, *args): config for config, args in todo}
+        for future in as_completed(futures):
+            config = futures[future]
+            record = future.result()
+            new_decisions = record.pop('new_decisions', None)
+            if new_decisions:
+                merged_cache.update(new_decisions)
+            for metrics_record in record.pop('metrics', []):
+                metrics_file.write(json.dumps({**config, **metrics_record}) + '\n')
+            for frame in record.pop('trace', []):
+                trace_file.write(frame)
+            f.write(json.dumps({**config, **record}) + '\n')
+            f.flush()
+    if decision_cache:
+        merged_cache.save(decision_cache)
+    return len(todo)
+
+
+def summarize(results):
+    """score distribution in the same form as the README statistics"""
+    solved = results.dropna(subset=['score'])
+    counts = solved['score'].value_counts().sort_index()
+    lines = [f'Score of {int(k)}: {v}' for k, v in counts.items()]
+    lines.append(f'Mean: {solved["score"].mean():.3f} over {len(solved)} games')
+    lines.append(f'Over six guesses: {(solved["score"] > 6).sum()}')
+    if len(solved) < len(results):
+        lines.append(f'Not in target list: {len(results) - len(solved)}')
+    if 'seconds' in results:
+        rounds = solved['score'].sum()
+        lines.append(f'Seconds per round: {solved["seconds"].sum() / rounds if rounds else 0:.4f}')
+    if 'cache_hits' in results:
+        hits = results['cache_hits'].sum()
+        lookups = hits + results['cache_misses'].sum()
+        lines.append(f'Decision cache hit rate: {hits / lookups if lookups else 0:.1%} of {lookups}')
+    return '\n'.join(lines)
+
+
+def summarize_by(results, groups, order=None):
+    """summarize as a table, a row per value of groups (a Series along results) with the number
+    of games at each score, the mean, the misses and the time taken. Rows are sorted by group,
+    or in order if it's given."""
+    solved = results['score'].notna()
+    scores = results['score'][solved].astype(int)
+    table = pd.crosstab(groups[solved], scores).add_prefix('score_')
+    table['mean'] = scores.groupby(groups[solved]).mean().round(3)
+    table['over_six'] = (scores > 6).groupby(groups[solved]).sum()
+    table['not_in_list'] = (~solved).groupby(groups).sum()
+    if 'seconds' in results:
+        rounds = scores.groupby(groups[solved]).sum()
+        table['seconds_per_round'] = (
+            results['seconds'][solved].groupby(groups[solved]).sum() / rounds
+        ).round(4)
+    if order is not None:
+        table = table.reindex(order)
+        score_columns = [x for x in table.columns if x.startswith('score_')]
+        table[score_columns] = table[score_columns].fillna(0).astype(int)
+        table['over_six'] = table['over_six'].fillna(0).astype(int)
+    return table.to_string()
+
+
+def summarize_sweep(results):
+    """summarize_by the cutoff"""
+    return summarize_by(results, results['solver_kwargs'].str['n'].rename('n'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtest a Wordle solver against known answers')
+    parser.add_argument('solver', type=str, help='solver class in wordle.py, e.g. WordNetWordle2')
+    parser.add_argument('answers', type=str, help='file with one answer per line')
+    parser.add_argument('--initial-guess', type=str, default=None, help='forced opening word')
+    parser.add_argument('--output', type=str, default=None, help='JSONL results file')
+    parser.add_argument('--workers', type=int, default=None, help='games played at once')
+    parser.add_argument(
+        '--solver-workers', type=int, default=None, help='max_workers of each game\'s solver'
+    )
+    parser.add_argument(
+        '--solver-kwargs', type=json.loads, default={}, help='JSON keyword arguments for the solver'
+    )
+    parser.add_argument(
+        '--decision-cache', type=str, default=None, help='file to load and save cached decisions'
+    )
+    parser.add_argument(
+        '--metrics', type=str, default=None, help='JSONL file for per round timings and counts'
+    )
+    parser.add_argument(
+        '--trace', type=str, default=None, help='file for compressed per game decision traces'
+    )
+    parser.add_argument(
+        '--hard-mode', action='store_true', default=False, help='play by hard mode rules'
+    )
+    parser.add_argument(
+        '--cutoffs',
+        type=lambda x: [int(n) for n in x.split(',')],
+        default=None,
+        help='comma separated target list sizes to sweep, e.g. 500,1000,2000 for WordleR',
+    )
+    args = parser.parse_args()
+    if args.cutoffs and not hasattr(getattr(wordle, args.solver), 'cutoff'):
+        parser.error(f'{args.solver} has no cutoff method to sweep')
+    mode = '_hard' if args.hard_mode else ''
+    sweep = '_sweep' if args.cutoffs else ''
+    output = args.output or f'backtest_{args.solver}_{args.initial_guess}{mode}{sweep}.jsonl'
+
+    run = partial(run_sweep, cutoffs=args.cutoffs) if args.cutoffs else run_backtest
+    played = run(
+        args.solver,
+        read_answers(args.answers),
+        output,
+        initial_guess=args.initial_guess,
+        solver_kwargs=args.solver_kwargs,
+        max_workers=args.workers,
+        solver_workers=args.solver_workers,
+        decision_cache=args.decision_cache,
+        metrics=args.metrics,
+        trace=args.trace,
+        hard_mode=args.hard_mode,
+    )
+    print(f'played {played} games, results in {output}')
+    solver_kwargs = with_defaults(args.solver_kwargs)
+    if args.cutoffs:
+        configs = [
+            run_config(args.solver, args.initial_guess, {**solver_kwargs, 'n': n}, args.hard_mode)
+            for n in args.cutoffs
+        ]
+        results = pd.concat([load_results(output, x) for x in configs], ignore_index=True)
+        print(summarize_sweep(results))
+    else:
+        config = run_config(args.solver, args.initial_guess, solver_kwargs, args.hard_mode)
+        print(summarize(load_results(output, config)))
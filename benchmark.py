@@ -0,0 +1,201 @@
+"""Timings for the solver hot paths, compared against a stored baseline.
+
+Every solver class in SOLVERS is timed on the same fixed state: its own word lists, a fixed
+answer and a fixed opening guess. Results are written as JSON, and when a baseline file is
+given any benchmark slower than the baseline by more than the tolerance is reported as a
+regression and the script exits non-zero.
+
+    python benchmark.py --save-baseline            # record benchmark_baseline.json
+    python benchmark.py --solvers WordleR          # compare against it
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+
+import wordle
+
+BASELINE_FILE = 'benchmark_baseline.json'
+
+# the solver classes timed and their constructor arguments. OptimalWordle (an exact search over
+# its whole word list in every round) and WordleVariant (word list files of your own) are left
+# out, they can't be timed on a fixed default setup.
+SOLVERS = {
+    'Wordle': {},
+    'WordNetWordle': {},
+    'WordleWordList': {},
+    'WordNetWordle2': {},
+    'WordNetMinMix': {},
+    'WordNetWordle3': {},
+    'WordleR': {'n': 3000},
+    'Primel': {},
+}
+
+
+def timed(func, setup=None, repeat=5):
+    """min and median wall time of func() over repeat runs, calling setup() untimed before each"""
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'repeat': repeat}
+
+
+def fixed_pairs(words, n=1000):
+    """a deterministic spread of (guess, answer) pairs from a word list"""
+    words = sorted(words)
+    step = max(1, len(words) // 50)
+    sample = words[::step][:50]
+    return [(x, y) for x in sample for y in sample][:n]
+
+
+def benchmark_solver(cls, repeat=5, opening='raise', solver_kwargs=None):
+    results = {}
+    start = time.perf_counter()
+    solver = cls(log_level='WARNING', backtest=True, **(solver_kwargs or {}))
+    results['init'] = {'min': time.perf_counter() - start, 'median': None, 'repeat': 1}
+
+    targets = sorted(solver.target_words)
+    answer = targets[len(targets) // 2]
+    if opening not in solver.short_words:
+        opening = sorted(solver.short_words)[0]
+    pairs = fixed_pairs(solver.target_words)
+    solver.get_pattern_matrix()
+
+    def after_opening():
+        """the state generate_guess sees in round 2 after the fixed opening guess"""
+        solver.init_game(answer, force_init_guess=opening, allow_counter_factual=True)
+        solver.evaluate_round(opening)
+
+    def round_two():
+        after_opening()
+        solver.remaining_words = [x[0] for x in solver.make_matching_short_words()]
+
+    round_two()
+    remaining = list(solver.remaining_words)
+    placement_words = sorted(solver.short_words)[:200]
+    solver.allow_counter_factual = False
+    candidates = [x[0] for x in solver.generate_guess(2)[0][: solver.top_guess_count]]
+
+    results['get_num_line'] = timed(
+        lambda: [solver.get_num_line(x, y) for x, y in pairs], repeat=repeat
+    )
+    results['score_word'] = timed(lambda: [solver.score_word(x, y) for x, y in pairs], repeat=repeat)
+    results['make_matching_short_words'] = timed(
+        solver.make_matching_short_words, after_opening, repeat=repeat
+    )
+    results['local_placement_score'] = timed(
+        lambda: [solver.local_placement_score(x, remaining) for x in placement_words],
+        repeat=repeat,
+    )
+    results['generate_guess'] = timed(lambda: solver.generate_guess(2), after_opening, repeat=repeat)
+    results['counter_factual_guess'] = timed(
+        lambda: solver.counter_factual_guess(candidates), round_two, repeat=repeat
+    )
+    results['play_game'] = timed(
+        lambda: solver.play_game(answer, force_init_guess=opening), repeat=repeat
+    )
+    solver.close()
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing each benchmark against the baseline, and whether any regressed. A
+    solver that failed, or a benchmark in the baseline with no timing now, is a regression."""
+    lines = []
+    regressed = False
+    for solver_name, benches in results['results'].items():
+        base_benches = baseline['results'].get(solver_name, {})
+        if 'error' in benches:
+            lines.append(f'{solver_name:>16} failed: {benches["error"]}  REGRESSION')
+            regressed = True
+            continue
+        for name, base in base_benches.items():
+            if 'min' in base and 'min' not in benches.get(name, {}):
+                lines.append(f'{solver_name:>16} {name:>26} no timing  REGRESSION')
+                regressed = True
+        for name, timing in benches.items():
+            base = base_benches.get(name)
+            if 'min' not in timing or not base or 'min' not in base:
+                continue
+            ratio = timing['min'] / base['min'] if base['min'] else float('inf')
+            flag = ''
+            if ratio > 1 + tolerance:
+                flag = '  REGRESSION'
+                regressed = True
+            lines.append(
+                f'{solver_name:>16} {name:>26} {base["min"]:10.5f}s -> {timing["min"]:10.5f}s'
+                f' x{ratio:.2f}{flag}'
+            )
+    return lines, regressed
+
+
+def error_message(e):
+    """the exception's type and first line with any text"""
+    message = next((x for x in str(e).splitlines() if any(c.isalnum() for c in x)), '')
+    return f'{type(e).__name__}: {message.strip()}'
+
+
+def run(solver_names=None, repeat=5):
+    results = {
+        'meta': {
+            'python': sys.version.split()[0],
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+        },
+        'results': {},
+    }
+    for name in solver_names or sorted(SOLVERS):
+        try:
+            results['results'][name] = benchmark_solver(
+                getattr(wordle, name), repeat=repeat, solver_kwargs=SOLVERS.get(name)
+            )
+        except (LookupError, FileNotFoundError) as e:
+            # missing corpora or data files for this class, keep going with the rest
+            results['results'][name] = {'skipped': error_message(e)}
+        except Exception as e:
+            # reported as a regression by compare
+            results['results'][name] = {'error': error_message(e)}
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Wordle solver hot paths')
+    parser.add_argument('--solvers', nargs='*', default=None, help='solver classes to run')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', type=str, default='benchmark_results.json')
+    parser.add_argument('--baseline', type=str, default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help='write results as baseline')
+    parser.add_argument(
+        '--tolerance', type=float, default=0.25, help='allowed slowdown before failing, 0.25 = 25%%'
+    )
+    args = parser.parse_args()
+
+    results = run(args.solvers, args.repeat)
+    with open(args.baseline if args.save_baseline else args.output, 'w') as f:
+        json.dump(results, f, indent=4)
+    for name, benches in results['results'].items():
+        if 'skipped' in benches:
+            print(f'{name:>16} skipped: {benches["skipped"]}')
+        elif 'error' in benches:
+            print(f'{name:>16} failed: {benches["error"]}')
+    if args.save_baseline:
+        print(f'saved baseline to {args.baseline}')
+        sys.exit(1 if any('error' in x for x in results['results'].values()) else 0)
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f'no baseline at {args.baseline}, run with --save-baseline first')
+        sys.exit(1 if any('error' in x for x in results['results'].values()) else 0)
+    lines, regressed = compare(results, baseline, args.tolerance)
+    print('\n'.join(lines))
+    sys.exit(1 if regressed else 0)
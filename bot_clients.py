@@ -0,0 +1,81 @@
+"""Async clients for the services the bot talks to: fetching the day's puzzle and posting the
+result. Each kind has a real client and a stub with the same methods, so tweet_script.py can run
+against local data (and tests never touch the network).
+
+    puzzles = StubPuzzleClient.from_file('puzzles.json')
+    puzzle = await puzzles.fetch('2023-01-05')
+"""
+import asyncio
+import json
+
+
+class NYTPuzzleClient:
+    """the puzzle for a date from the New York Times Wordle API"""
+
+    url = 'https://www.nytimes.com/svc/wordle/v2/{date}.json'
+
+    def __init__(self, timeout=30):
+        import requests
+
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    def get(self, date):
+        url = self.url.format(date=date)
+        print(f'Retrieving {url}')
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch(self, date):
+        """{'date', 'wordle_num', 'solution'} for the puzzle of date (YYYY-MM-DD)"""
+        data = await asyncio.to_thread(self.get, date)
+        return puzzle_from_response(date, data)
+
+
+def puzzle_from_response(date, data):
+    return {'date': date, 'wordle_num': data['days_since_launch'], 'solution': data['solution']}
+
+
+class StubPuzzleClient:
+    """puzzles from a dict of date -> API response ({'solution', 'days_since_launch'})"""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    async def fetch(self, date):
+        if date not in self.responses:
+            raise KeyError(f'no puzzle for {date}')
+        return puzzle_from_response(date, self.responses[date])
+
+
+class MastodonClient:
+    """posts statuses to a Mastodon server"""
+
+    def __init__(self, access_token='mastodon.secret', api_base_url='https://vmst.io'):
+        from mastodon import Mastodon
+
+        self.mastodon = Mastodon(access_token=access_token, api_base_url=api_base_url)
+
+    async def post(self, text, spoiler_text=None):
+        """the id of the new status"""
+        response = await asyncio.to_thread(
+            self.mastodon.status_post, status=text, spoiler_text=spoiler_text
+        )
+        return response['id']
+
+
+class StubPostClient:
+    """keeps the statuses it's given instead of posting them"""
+
+    def __init__(self):
+        self.posts = []
+
+    async def post(self, text, spoiler_text=None):
+        self.posts.append({'text': text, 'spoiler_text': spoiler_text})
+        return len(self.posts)
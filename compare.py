@@ -0,0 +1,250 @@
+"""Play several solvers, or one solver with different settings, against the same answers and
+line their scores up side by side.
+
+A strategy is a solver class in wordle.py, optionally followed by attributes to set on it, e.g.
+'WordNetWordle2:strategy=entropy,top_guess_count=60'. Classes that build the same word lists
+(WordNetWordle2, WordNetMinMix and WordNetWordle3 all use WordNetWordle2's) share one loaded
+set in each worker: the first is constructed and the others are made from it, so the corpora,
+frequency tables, pattern matrix and word codes are loaded once per word list instead of once
+per strategy. Games are spread across a process pool and recorded like backtest.py's, so an
+interrupted comparison picks up where it left off and plain strategies reuse backtest results.
+
+    python compare.py wordle_answers.txt WordNetWordle2 WordNetMinMix WordNetWordle3 \\
+        'WordNetWordle2:strategy=entropy' --initial-guess raise --output compare.jsonl
+"""
+import argparse
+import json
+
+import pandas as pd
+
+import wordle
+from backtest import (
+    configure,
+    load_results,
+    play_all,
+    play_with,
+    read_answers,
+    remaining_answers,
+    run_config,
+    summarize_by,
+    with_defaults,
+)
+from decision_cache import DecisionCache
+
+# solver attributes that change during a game, so each strategy gets its own
+NOT_SHARED = (
+    'game_state',
+    'word_array',
+    'legal_guesses',
+    'letter_counts',
+    'pool',
+    'search',
+    'policy',
+    'decision_cache',
+    'metrics',
+    'trace',
+    'rollouts',
+)
+
+_solvers = {}
+
+
+def parse_strategy(text):
+    """(solver class name, settings) from 'Class' or 'Class:attribute=value,...', values
+    read as JSON where they can be"""
+    solver_name, _, rest = text.partition(':')
+    settings = {}
+    for item in filter(None, rest.split(',')):
+        key, _, val = item.partition('=')
+        try:
+            settings[key.strip()] = json.loads(val)
+        except json.JSONDecodeError:
+            settings[key.strip()] = val.strip()
+    return solver_name.strip(), settings
+
+
+def strategy_label(solver_name, settings):
+    if not settings:
+        return solver_name
+    return solver_name + ':' + ','.join(f'{k}={v}' for k, v in sorted(settings.items()))
+
+
+def word_list_source(cls):
+    """everything that decides the word lists and tables a solver class builds, the same for
+    classes that can share them"""
+    return (
+        cls.__init__,
+        cls.make_word_list,
+        cls.make_frequency_series,
+        cls.make_commonality_lookup,
+        cls.artifact_params,
+        cls.alphabet,
+        cls.word_length,
+        cls.source_files,
+    )
+
+
+def share_tables(solver, cls, settings):
+    """a cls solver using solver's word lists and tables, with settings set on it"""
+    shared = object.__new__(cls)
+    shared.__dict__.update({k: v for k, v in solver.__dict__.items() if k not in NOT_SHARED})
+    for key, val in settings.items():
+        setattr(shared, key, val)
+    if settings:
+        # settings can change decisions in ways decision_key doesn't see
+        shared.decision_scope = strategy_label(cls.__name__, settings)
+    return shared
+
+
+def load_strategies(strategies, solver_kwargs):
+    """{label: solver} for the strategies, constructing one solver per word list"""
+    loaded = {}
+    solvers = {}
+    for solver_name, settings in strategies:
+        cls = getattr(wordle, solver_name)
+        source = word_list_source(cls)
+        if source not in loaded:
+            solver = cls(**solver_kwargs)
+            # built before sharing so every strategy uses the same ones
+            solver.get_pattern_matrix()
+            solver.get_guess_array()
+            loaded[source] = solver
+        solvers[strategy_label(solver_name, settings)] = share_tables(
+            loaded[source], cls, settings
+        )
+    return solvers
+
+
+def _init_worker(strategies, solver_kwargs, hard_mode, solver_workers, decision_cache, *args):
+    _solvers.update(load_strategies(strategies, solver_kwargs))
+    # one cache for all of them, each strategy's decisions are keyed by its decision_scope
+    cache = DecisionCache.load(decision_cache) if decision_cache else None
+    for solver in _solvers.values():
+        configure(solver, hard_mode, solver_workers, cache, *args)
+
+
+def play_strategy(label, answer, initial_guess):
+    """play_with the worker's solver for the strategy"""
+    return play_with(_solvers[label], answer, initial_guess)
+
+
+def strategy_configs(strategies, initial_guess, solver_kwargs, hard_mode):
+    return {
+        strategy_label(*x): run_config(x[0], initial_guess, solver_kwargs, hard_mode, x[1])
+        for x in strategies
+    }
+
+
+def run_comparison(
+    strategies,
+    answers,
+    output,
+    initial_guess=None,
+    solver_kwargs=None,
+    max_workers=None,
+    solver_workers=None,
+    decision_cache=None,
+    metrics=None,
+    trace=None,
+    hard_mode=False,
+):
+    """Play every answer with each of strategies, (solver class name, settings) pairs, that
+    isn't recorded in output yet, as run_backtest does for one solver. Returns the number of
+    games played."""
+    solver_kwargs = with_defaults(solver_kwargs)
+    configs = strategy_configs(strategies, initial_guess, solver_kwargs, hard_mode)
+    todo = [
+        (config, (label, x, initial_guess))
+        for label, config in configs.items()
+        for x in remaining_answers(output, config, answers)
+    ]
+    return play_all(
+        play_strategy,
+        todo,
+        output,
+        _init_worker,
+        (strategies, solver_kwargs, hard_mode, solver_workers, decision_cache, metrics, trace),
+        max_workers,
+        decision_cache,
+        metrics,
+        trace,
+    )
+
+
+def load_comparison(output, configs):
+    """the result lines of each strategy's config, with its label as 'strategy'"""
+    return pd.concat(
+        [load_results(output, x).assign(strategy=label) for label, x in configs.items()],
+        ignore_index=True,
+    )
+
+
+def score_table(results):
+    """a row per answer and a column of scores per strategy, in the order they were given"""
+    table = results.pivot_table(index='answer', columns='strategy', values='score', dropna=False)
+    return table[list(dict.fromkeys(results['strategy']))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare solvers against the same answers')
+    parser.add_argument('answers', type=str, help='file with one answer per line')
+    parser.add_argument(
+        'strategies',
+        type=str,
+        nargs='+',
+        help='solver classes in wordle.py, each optionally with settings, e.g. '
+        'WordNetWordle2:strategy=entropy',
+    )
+    parser.add_argument('--initial-guess', type=str, default=None, help='forced opening word')
+    parser.add_argument('--output', type=str, default=None, help='JSONL results file')
+    parser.add_argument('--scores', type=str, default=None, help='CSV of scores per answer')
+    parser.add_argument('--workers', type=int, default=None, help='games played at once')
+    parser.add_argument(
+        '--solver-workers', type=int, default=None, help='max_workers of each game\'s solver'
+    )
+    parser.add_argument(
+        '--solver-kwargs', type=json.loads, default={}, help='JSON keyword arguments for solvers'
+    )
+    parser.add_argument(
+        '--decision-cache', type=str, default=None, help='file to load and save cached decisions'
+    )
+    parser.add_argument(
+        '--metrics', type=str, default=None, help='JSONL file for per round timings and counts'
+    )
+    parser.add_argument(
+        '--trace', type=str, default=None, help='file for compressed per game decision traces'
+    )
+    parser.add_argument(
+        '--hard-mode', action='store_true', default=False, help='play by hard mode rules'
+    )
+    args = parser.parse_args()
+    strategies = [parse_strategy(x) for x in args.strategies]
+    for solver_name, _ in strategies:
+        if not hasattr(wordle, solver_name):
+            parser.error(f'no solver class {solver_name} in wordle.py')
+    mode = '_hard' if args.hard_mode else ''
+    output = args.output or f'compare_{args.initial_guess}{mode}.jsonl'
+
+    played = run_comparison(
+        strategies,
+        read_answers(args.answers),
+        output,
+        initial_guess=args.initial_guess,
+        solver_kwargs=args.solver_kwargs,
+        max_workers=args.workers,
+        solver_workers=args.solver_workers,
+        decision_cache=args.decision_cache,
+        metrics=args.metrics,
+        trace=args.trace,
+        hard_mode=args.hard_mode,
+    )
+    print(f'played {played} games, results in {output}')
+    configs = strategy_configs(
+        strategies, args.initial_guess, with_defaults(args.solver_kwargs), args.hard_mode
+    )
+    results = load_comparison(output, configs)
+    scores = score_table(results)
+    if args.scores:
+        scores.to_csv(args.scores)
+    # in the order the strategies were given, like the score columns
+    print(summarize_by(results, results['strategy'], list(scores.columns)))
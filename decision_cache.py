@@ -0,0 +1,131 @@
+"""Memoized guess decisions keyed by the solver state that determines them.
+
+Within a backtest many answers reach exactly the same state (same guesses, same feedback, same
+remaining words), and the counterfactual analysis for that state gives the same guess every
+time. `DecisionCache` keeps those decisions in a bounded LRU map, counts hits and misses, and can
+be saved to and loaded from disk between runs.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+from patterns import cache_key
+from strategies import get_strategy
+
+
+def words_hash(solver):
+    """cache_key of the solver's word lists, hashed again only when either list changes"""
+    lists = (
+        id(solver.short_words),
+        len(solver.short_words),
+        id(solver.target_words),
+        len(solver.target_words),
+    )
+    cached = solver.__dict__.get('words_hash')
+    if cached is None or cached[0] != lists:
+        cached = (lists, cache_key(solver.short_words, solver.target_words))
+        solver.words_hash = cached
+    return cached[1]
+
+
+def decision_key(solver, i):
+    """Hash of everything generate_guess and next_guess read for round i, or None if the
+    decision can't be cached (a custom Strategy without a name can't be told apart from
+    another). The remaining words are hashed in order since their order breaks ties between
+    equally scored guesses."""
+    strategy = get_strategy(solver.strategy)
+    if strategy.name is None:
+        return None
+    parts = [
+        type(solver).__name__,
+        solver.decision_scope,
+        str(solver.top_guess_count),
+        solver.counter_factual_mode,
+        str(solver.counter_factual_batch_size),
+        str(solver.counter_factual_time_budget),
+        strategy.name,
+        str(i),
+        str(bool(solver.hard_mode)),
+        str(bool(solver.guess_valid_only)),
+        str(bool(solver.allow_counter_factual)),
+        str(solver.force_init_guess),
+        ','.join(solver.guesses),
+        ','.join(f'{k}{v}' for k, v in sorted(solver.good_letters.items())),
+        ','.join(f'{k}{v}' for k, v in sorted(solver.partial_solution.items())),
+        ','.join(f'{k}{v}' for k, v in sorted(solver.bad_position_dict)),
+        str(solver.possible_bits),
+        ''.join(sorted(solver.no_double_letters)),
+        words_hash(solver),
+        ','.join(solver.remaining_words),
+    ]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+class DecisionCache:
+    """LRU map from decision_key to the guess chosen, with hit and miss counts"""
+
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.new_entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        guess = self.entries.get(key)
+        if guess is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return guess
+
+    def put(self, key, guess):
+        self.entries[key] = guess
+        self.entries.move_to_end(key)
+        self.new_entries[key] = guess
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def update(self, entries):
+        for key, guess in entries.items():
+            self.put(key, guess)
+
+    def drain_new_entries(self):
+        """entries added since the last call, for merging caches built in other processes"""
+        new_entries, self.new_entries = self.new_entries, {}
+        return new_entries
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'entries': len(self.entries),
+        }
+
+    def save(self, path):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, max_entries=100_000):
+        """the cache saved at path, or an empty one if there isn't a file yet"""
+        cache = cls(max_entries)
+        if os.path.exists(path):
+            with open(path) as f:
+                cache.entries.update(json.load(f))
+        while len(cache.entries) > max_entries:
+            cache.entries.popitem(last=False)
+        return cache
@@ -0,0 +1,63 @@
+"""Word frequency lookups for the commonality tie breaker without loading the whole unigram file.
+
+The first use builds a small index holding only the words of the needed length, sorted so
+lookups are a binary search, and saves it next to the other cached tables. Indexes are loaded
+lazily and kept per process, so every solver instance shares one copy.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from patterns import CACHE_DIR, WORD_LENGTH
+
+FREQUENCY_FILE = 'unigram_freq.csv'
+
+_indexes = {}
+
+
+class FrequencyIndex:
+    """sorted words of one length with their counts"""
+
+    def __init__(self, words, counts):
+        self.words = words
+        self.counts = counts
+
+    @classmethod
+    def build(cls, path=FREQUENCY_FILE, length=WORD_LENGTH):
+        df = pd.read_csv(path)
+        df = df[df['word'].str.len() == length].dropna(subset=['count'])
+        # like building a dict from the rows, a repeated word keeps its last count
+        df = df.drop_duplicates('word', keep='last').sort_values('word')
+        return cls(df['word'].to_numpy(dtype=f'U{length}'), df['count'].to_numpy(dtype=np.int64))
+
+    @classmethod
+    def load(cls, path=FREQUENCY_FILE, length=WORD_LENGTH, cache_dir=CACHE_DIR):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, length)
+        if key in _indexes:
+            return _indexes[key]
+        name = os.path.splitext(os.path.basename(path))[0]
+        cache_path = os.path.join(
+            cache_dir, f'{name}_{length}_{stat.st_size}_{stat.st_mtime_ns}.npz'
+        )
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as data:
+                index = cls(data['words'], data['counts'])
+        else:
+            index = cls.build(path, length)
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp.npz'
+            np.savez(tmp_path, words=index.words, counts=index.counts)
+            os.replace(tmp_path, cache_path)
+        _indexes[key] = index
+        return index
+
+    def lookup(self, words, default=0):
+        """counts for each of words, default for any not in the index"""
+        if not len(words) or not len(self.words):
+            return [default] * len(words)
+        query = np.asarray(words)
+        positions = np.minimum(np.searchsorted(self.words, query), len(self.words) - 1)
+        found = self.words[positions] == query
+        return np.where(found, self.counts[positions], default).tolist()
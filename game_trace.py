@@ -0,0 +1,216 @@
+"""Compact per game traces of a solver's decisions, and a tool to re-run any recorded round.
+
+Attach a `TraceRecorder` to a solver (`w.trace = TraceRecorder('games.trace')`) and each game of
+`play_game` is written as one frame: the solver class, its constructor parameters and settings,
+the answer, and for every round the feedback codes and letter and position constraints it
+started from, the guess chosen, the words still possible and the top scored candidates. Frames
+are zlib compressed JSON behind a four byte length, appended as games end.
+
+`replay_round` rebuilds the solver, restores a round's recorded state directly and runs the
+decision again, e.g. to check a code change against a backtest or look at a decision in the
+debugger. Rounds of traces written before the state was recorded are reached by playing the
+recorded guesses back from the start.
+
+    python game_trace.py show games.trace
+    python game_trace.py replay games.trace --game 3 --round 2
+"""
+import argparse
+import json
+import struct
+import zlib
+
+from patterns import line_to_code
+from strategies import get_strategy
+from word_array import GameState
+
+HEADER = struct.Struct('<I')
+
+# solver attributes besides the constructor parameters that change the decisions
+SETTINGS = (
+    'top_guess_count',
+    'hard_mode',
+    'counter_factual_mode',
+    'counter_factual_batch_size',
+    'counter_factual_time_budget',
+    'objective',
+)
+
+TOP_CANDIDATES = 10
+
+
+def solver_settings(solver):
+    settings = {key: getattr(solver, key) for key in SETTINGS if hasattr(solver, key)}
+    settings['strategy'] = get_strategy(solver.strategy).name
+    return settings
+
+
+def state_record(solver):
+    """the solver's GameState as JSON"""
+    return {
+        'partial_solution': {str(k): v for k, v in solver.partial_solution.items()},
+        'bad_position_dict': sorted(solver.bad_position_dict),
+        'good_letters': dict(solver.good_letters),
+        'no_double_letters': sorted(solver.no_double_letters),
+        'possible_bits': solver.possible_bits,
+    }
+
+
+def load_state(record):
+    """the GameState of a state_record"""
+    return GameState(
+        {int(k): v for k, v in record['partial_solution'].items()},
+        [tuple(x) for x in record['bad_position_dict']],
+        dict(record['good_letters']),
+        dict.fromkeys(record['no_double_letters'], True),
+        record['possible_bits'],
+    )
+
+
+def encode_frame(record):
+    data = zlib.compress(json.dumps(record, separators=(',', ':')).encode())
+    return HEADER.pack(len(data)) + data
+
+
+def read_games(path):
+    """every game recorded in the trace file, in order"""
+    games = []
+    with open(path, 'rb') as f:
+        while header := f.read(HEADER.size):
+            if len(header) < HEADER.size:
+                break
+            (size,) = HEADER.unpack(header)
+            data = f.read(size)
+            if len(data) < size:
+                # a frame cut short by an interrupted run
+                break
+            games.append(json.loads(zlib.decompress(data)))
+    return games
+
+
+class TraceRecorder:
+    """Collects a frame per game, appending it to path when the game ends, or keeping it for
+    drain if path is None"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.frames = []
+        self.game = None
+        self.round = None
+
+    def start_game(self, solver):
+        self.game = {
+            'solver': type(solver).__name__,
+            'params': solver.artifact_params(),
+            'settings': solver_settings(solver),
+            'answer': solver.answer,
+            'guess_valid_only': solver.guess_valid_only,
+            'force_init_guess': solver.force_init_guess,
+            'allow_counter_factual': solver.allow_counter_factual,
+            'rounds': [],
+        }
+
+    def start_round(self, solver, i):
+        self.round = {
+            'round': i,
+            'source': 'computed',
+            'feedback': [line_to_code(x) for x in solver.success_grid],
+            'state': state_record(solver),
+        }
+
+    def count(self, **values):
+        """add values (candidate counts, where the guess came from, ...) to the current round"""
+        if self.round is not None:
+            self.round.update(values)
+
+    def candidates(self, top):
+        """the scored candidates of the decision being made, best first, as dicts with a 'word'"""
+        if self.round is not None:
+            self.round['top'] = top[:TOP_CANDIDATES]
+
+    def end_round(self, solver, guess):
+        record = self.round
+        record['guess'] = guess
+        record['remaining'] = len(solver.remaining_words)
+        self.round = None
+        self.game['rounds'].append(record)
+
+    def end_game(self, solver):
+        self.game['guesses'] = list(solver.guesses)
+        frame = encode_frame(self.game)
+        self.game = None
+        if self.path is None:
+            self.frames.append(frame)
+        else:
+            with open(self.path, 'ab') as f:
+                f.write(frame)
+
+    def drain(self):
+        """the frames kept since the last call"""
+        frames, self.frames = self.frames, []
+        return frames
+
+
+def make_solver(game):
+    import wordle
+
+    solver = getattr(wordle, game['solver'])(log_level='WARNING', **game['params'])
+    for key, val in game['settings'].items():
+        setattr(solver, key, val)
+    return solver
+
+
+def replay_round(game, i, solver=None):
+    """Run the decision for round i of a recorded game again: start the game as it was
+    started, restore the guesses, feedback and constraints recorded for round i and return
+    the guess the solver makes now."""
+    solver = solver or make_solver(game)
+    solver.init_game(
+        game['answer'],
+        guess_valid_only=game['guess_valid_only'],
+        force_init_guess=game['force_init_guess'],
+        allow_counter_factual=game['allow_counter_factual'],
+    )
+    solver.wordle_num = ''
+    record = game['rounds'][i - 1]
+    if 'state' in record:
+        solver.guesses = list(game['guesses'][: i - 1])
+        solver.success_grid = [list(solver.spec.pattern_lines[x]) for x in record['feedback']]
+        solver.game_state = load_state(record['state'])
+        # the target words the constraints leave, as play_game narrows them round by round
+        solver.remaining_words = [x[0] for x in solver.make_matching_short_words()]
+        return solver.next_guess(i)
+    # traces without the state, play the earlier rounds back
+    for guess in game['guesses'][: i - 1]:
+        solver.remaining_words = [x[0] for x in solver.make_matching_short_words()]
+        solver.evaluate_round(guess)
+        solver.final_list_length = len(solver.remaining_words)
+        solver.word_list_length.append(solver.final_list_length)
+    return solver.next_guess(i)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show recorded games or re-run a decision')
+    parser.add_argument('command', choices=['show', 'replay'])
+    parser.add_argument('path', type=str, help='trace file written by TraceRecorder')
+    parser.add_argument('--game', type=int, default=0, help='index of the game in the file')
+    parser.add_argument('--round', type=int, default=None, help='round to re-run, all if unset')
+    args = parser.parse_args()
+
+    games = read_games(args.path)
+    if args.command == 'show':
+        for n, game in enumerate(games):
+            print(f"{n}: {game['solver']} {game['answer']} {' '.join(game['guesses'])}")
+    else:
+        game = games[args.game]
+        solver = make_solver(game)
+        rounds = [args.round] if args.round else [x['round'] for x in game['rounds']]
+        for i in rounds:
+            recorded = game['rounds'][i - 1]
+            guess = replay_round(game, i, solver)
+            status = 'same' if guess == recorded['guess'] else 'DIFFERENT'
+            print(
+                f"round {i}: recorded {recorded['guess']} ({recorded['source']}), "
+                f'now {guess} {status}'
+            )
+            for candidate in recorded.get('top', []):
+                print(f'    {candidate}')
@@ -0,0 +1,75 @@
+"""The bot's record of solved and posted puzzles, kept as an append only JSON lines file.
+
+Each line is a full entry for a puzzle or an update to one (the post id once it has been
+posted), so recording a day never rewrites the file and an interrupted run loses at most the
+line being written. Loading folds the lines into one entry per wordle_num. The older
+better_history.json list is imported the first time the store is opened.
+"""
+import json
+import os
+
+LEGACY_FILE = 'better_history.json'
+
+
+class History:
+    """entries by wordle_num, appending every change to path"""
+
+    def __init__(self, path='better_history.jsonl', legacy_path=LEGACY_FILE):
+        self.path = path
+        self.entries = {}
+        if not os.path.exists(path) and legacy_path and os.path.exists(legacy_path):
+            with open(legacy_path) as f:
+                for entry in json.load(f):
+                    self.append(entry)
+        else:
+            self.load()
+
+    def load(self):
+        self.entries = {}
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # a line cut short by an interrupted run
+                    continue
+                self.merge(record)
+        if os.path.getsize(self.path):
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                cut_short = f.read() != b'\n'
+            if cut_short:
+                # start a fresh line after an interrupted write
+                with open(self.path, 'a') as f:
+                    f.write('\n')
+
+    def merge(self, record):
+        num = record['wordle_num']
+        self.entries[num] = {**self.entries.get(num, {}), **record}
+
+    def append(self, record):
+        """record an entry, or an update to the entry with the same wordle_num"""
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        self.merge(record)
+
+    def get(self, wordle_num):
+        return self.entries.get(wordle_num)
+
+    def __contains__(self, wordle_num):
+        return wordle_num in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def solved(self, wordle_num):
+        return 'score' in self.entries.get(wordle_num, {})
+
+    def posted(self, wordle_num):
+        return self.entries.get(wordle_num, {}).get('masto_id') is not None
+
+    def to_list(self):
+        """every entry, oldest puzzle first"""
+        return [self.entries[x] for x in sorted(self.entries)]
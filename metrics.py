@@ -0,0 +1,113 @@
+"""Per round timings and counts from a solver, for seeing where the time goes.
+
+Attach a `Metrics` to a solver (`w.metrics = Metrics()`) and every round of `play_game` produces
+a record with the seconds spent in each phase of the guess (filter, heuristic, counterfactual,
+selection), the remaining and candidate word counts, how busy the worker pool was and whether
+the guess came from the policy or decision cache. Each game adds a summary record. Records are
+plain dicts handed to every hook as they are made and kept for `save` or `to_frame`. Without
+a Metrics attached the solver only pays for a few None checks per round.
+
+    w.metrics = Metrics(hooks=[print_progress])
+    w.play_game('crane', force_init_guess='raise')
+    w.metrics.to_frame()
+"""
+import json
+import time
+
+import pandas as pd
+
+PHASES = ('filter', 'heuristic', 'counterfactual', 'selection')
+
+
+def print_progress(record):
+    """a hook printing a line per finished game"""
+    if record['type'] == 'game':
+        print(
+            f"{record['answer']}: {record['rounds']} rounds in {record['seconds']:.2f}s",
+            flush=True,
+        )
+
+
+class Metrics:
+    """Collects round and game records from a solver and passes each one to the hooks"""
+
+    def __init__(self, hooks=(), keep=True):
+        self.hooks = list(hooks)
+        self.keep = keep
+        self.records = []
+        self.game = None
+        self.round = None
+        self.last_lap = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def emit(self, record):
+        for hook in self.hooks:
+            hook(record)
+        if self.keep:
+            self.records.append(record)
+
+    def start_game(self, solver):
+        self.game = {
+            'type': 'game',
+            'solver': type(solver).__name__,
+            'answer': solver.answer,
+            'wordle_num': solver.wordle_num,
+            'start': time.perf_counter(),
+        }
+
+    def end_game(self, solver, rounds):
+        record = self.game
+        record['seconds'] = time.perf_counter() - record.pop('start')
+        record['rounds'] = rounds
+        record['guesses'] = list(solver.guesses)
+        self.game = None
+        self.emit(record)
+
+    def start_round(self, solver, i):
+        self.round = {
+            'type': 'round',
+            'solver': type(solver).__name__,
+            'answer': solver.answer,
+            'round': i,
+            'source': 'computed',
+            'start': time.perf_counter(),
+            **{f'{name}_seconds': 0.0 for name in PHASES},
+        }
+        self.last_lap = self.round['start']
+
+    def end_round(self, solver, guess):
+        record = self.round
+        record['seconds'] = time.perf_counter() - record.pop('start')
+        record['guess'] = guess
+        record['remaining'] = len(solver.remaining_words)
+        self.round = None
+        self.emit(record)
+
+    def lap(self, name):
+        """count the time since the last lap (or the start of the round) towards phase name"""
+        if self.round is not None:
+            now = time.perf_counter()
+            self.round[f'{name}_seconds'] += now - self.last_lap
+            self.last_lap = now
+
+    def count(self, **values):
+        """add values (candidate counts, cache results, ...) to the current round"""
+        if self.round is not None:
+            self.round.update(values)
+
+    def drain(self):
+        """the records kept since the last call"""
+        records, self.records = self.records, []
+        return records
+
+    def save(self, path):
+        """append the records kept since the last save or drain to a JSON lines file, and stop
+        keeping them so saving again doesn't write them twice"""
+        with open(path, 'a') as f:
+            for record in self.drain():
+                f.write(json.dumps(record) + '\n')
+
+    def to_frame(self, kind='round'):
+        return pd.DataFrame([x for x in self.records if x['type'] == kind])
@@ -0,0 +1,309 @@
+"""Exact optimal guess trees by branch and bound.
+
+For a set of possible answers S, the best tree guesses some word, splits S by the feedback it
+gets and solves each group the same way. Minimizing the expected number of guesses means
+minimizing the total over S of the guesses each answer takes; the worst case objective
+minimizes the deepest answer instead. Both are searched exactly:
+
+- subproblems are memoized by the set of answers left, with the proven lower bound kept when a
+  search fails to get under its budget so it isn't repeated for the same or a smaller budget
+- every guess gets an admissible lower bound from its feedback histogram alone (a group of m
+  answers needs at least 2m - 1 guesses in total and 2 in depth when m > 1), guesses are tried
+  best bound first and the search stops once no bound is below the best cost found
+- the first guess's candidates are evaluated on several processes at once
+
+In hard mode every guess has to keep the greens in place and reuse the letters found on the
+path to it, so each node only guesses from the words that are still legal there and subproblems
+are memoized by those constraints as well as the answers left.
+
+This is only practical for a few hundred answers. The result is a `policy.Policy`, so any solver
+with the same word lists can play it through `load_policy`.
+
+    python optimal.py WordleR --solver-kwargs '{"n": 300}' --workers 4 --output optimal.json
+"""
+import argparse
+import json
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from patterns import ALPHABET, get_spec, pattern_histograms
+from policy import Policy, counter_factual_settings, path_key, words_key
+from strategies import get_strategy
+from word_array import GameState, LegalGuesses, WordCodes
+
+OBJECTIVES = ('expected', 'worst_case')
+
+_worker_search = None
+
+
+class OptimalSearch:
+    """Branch and bound over guesses (the guess words) for subsets of answers (the answer words)"""
+
+    def __init__(
+        self, patterns, guesses, answers, objective='expected', hard_mode=False, alphabet=ALPHABET
+    ):
+        if objective not in OBJECTIVES:
+            raise ValueError(f'objective must be one of {OBJECTIVES}, not {objective!r}')
+        self.guesses = list(guesses)
+        self.answers = list(answers)
+        self.objective = objective
+        self.hard_mode = hard_mode
+        self.length = len(self.answers[0])
+        self.spec = get_spec(alphabet, self.length)
+        self.winning_code = self.spec.winning_code
+        # hard mode constraints (greens, letter counts) -> legal guess mask
+        self.word_codes = WordCodes(self.guesses, alphabet) if hard_mode else None
+        self.legal_masks = {}
+        self.codes = patterns.submatrix(self.guesses, self.answers)
+        guess_index = {x: j for j, x in enumerate(self.guesses)}
+        missing = [x for x in self.answers if x not in guess_index]
+        if missing:
+            raise ValueError(f'answers must also be allowed guesses, missing {missing[:5]}')
+        self.answer_guess = np.array([guess_index[x] for x in self.answers])
+        self.answer_index = {x: i for i, x in enumerate(self.answers)}
+        self.exact = {}
+        self.lower = {}
+
+    def bound(self, sizes):
+        """lower bound on the cost of each group of answers of the given sizes"""
+        if self.objective == 'expected':
+            return 2 * sizes - 1
+        return np.where(sizes > 1, 2, 1)
+
+    def root_constraints(self):
+        """the constraints before any guess, None outside hard mode"""
+        return ((), ()) if self.hard_mode else None
+
+    def constraints(self, greens, min_counts):
+        """hard mode constraints from a GameState's partial_solution and good_letters"""
+        if not self.hard_mode:
+            return None
+        return tuple(sorted(greens.items())), tuple(sorted(min_counts.items()))
+
+    def narrow(self, constraints, guess, code):
+        """the constraints after guess (an index) got the feedback code"""
+        if constraints is None:
+            return None
+        word, line = self.guesses[guess], self.spec.pattern_lines[code]
+        greens, min_counts = dict(constraints[0]), dict(constraints[1])
+        found = {}
+        for i, (letter, mark) in enumerate(zip(word, line)):
+            if mark == 2:
+                greens[i] = letter
+            if mark > 0:
+                found[letter] = found.get(letter, 0) + 1
+        for letter, count in found.items():
+            min_counts[letter] = max(min_counts.get(letter, 0), count)
+        return self.constraints(greens, min_counts)
+
+    def legal(self, constraints):
+        """boolean mask of the guesses allowed under the hard mode constraints"""
+        mask = self.legal_masks.get(constraints)
+        if mask is None:
+            state = GameState(dict(constraints[0]), good_letters=dict(constraints[1]))
+            mask = LegalGuesses(self.word_codes).update(state).mask
+            self.legal_masks[constraints] = mask
+        return mask
+
+    def guess_bounds(self, subset, constraints=None):
+        """lower bound on the cost of every guess for subset, inf for guesses that don't split it
+        or aren't legal under the hard mode constraints"""
+        n = len(subset)
+        sizes = pattern_histograms(self.codes[:, subset], self.length).astype(np.int64)
+        sizes[:, self.winning_code] = 0
+        group_bounds = np.where(sizes > 0, self.bound(sizes), 0)
+        if self.objective == 'expected':
+            bounds = n + group_bounds.sum(axis=1)
+        else:
+            bounds = 1 + group_bounds.max(axis=1)
+        bounds = np.where(sizes.max(axis=1) == n, np.inf, bounds)
+        if constraints is not None:
+            bounds[~self.legal(constraints)] = np.inf
+        return bounds
+
+    def split(self, subset, guess):
+        """the groups of subset for each feedback guess gets, apart from a win, biggest first"""
+        codes = self.codes[guess, subset]
+        groups = [(int(code), subset[codes == code]) for code in np.unique(codes)]
+        groups = [x for x in groups if x[0] != self.winning_code]
+        return sorted(groups, key=lambda x: -len(x[1]))
+
+    def guess_cost(self, subset, guess, beta=math.inf, constraints=None):
+        """exact cost of guess for subset if below beta, otherwise a lower bound that's at least beta"""
+        groups = self.split(subset, guess)
+        bounds = [int(self.bound(np.array(len(x)))) for _, x in groups]
+        if self.objective == 'expected':
+            total, remaining = len(subset), sum(bounds)
+            for (code, group), group_bound in zip(groups, bounds):
+                remaining -= group_bound
+                cost, _ = self.solve(
+                    group, beta - total - remaining, self.narrow(constraints, guess, code)
+                )
+                total += cost
+                if total + remaining >= beta:
+                    return total + remaining
+            return total
+        worst = 1
+        for code, group in groups:
+            cost, _ = self.solve(group, beta - 1, self.narrow(constraints, guess, code))
+            worst = max(worst, 1 + cost)
+            if worst >= beta:
+                return worst
+        return worst
+
+    def solve(self, subset, beta=math.inf, constraints=None):
+        """(cost, best guess index) for subset, an array of answer indices, if the optimum is
+        below beta, otherwise (a lower bound at least beta, None). constraints are the hard mode
+        ones on the path to subset."""
+        if len(subset) == 1:
+            return 1, self.answer_guess[subset[0]]
+        key = subset.tobytes() if constraints is None else (subset.tobytes(), constraints)
+        if key in self.exact:
+            cost, guess = self.exact[key]
+            return (cost, guess) if cost < beta else (cost, None)
+        lower = self.lower.get(key, 0)
+        if lower >= beta:
+            return lower, None
+
+        bounds = self.guess_bounds(subset, constraints)
+        best, best_guess = beta, None
+        for guess in np.argsort(bounds, kind='stable'):
+            if bounds[guess] >= best:
+                break
+            cost = self.guess_cost(subset, guess, best, constraints)
+            if cost < best:
+                best, best_guess = cost, guess
+        if best_guess is None:
+            self.lower[key] = max(lower, beta)
+            return beta, None
+        self.exact[key] = (best, best_guess)
+        return best, best_guess
+
+    def subset(self, answers):
+        return np.array(sorted(self.answer_index[x] for x in answers), dtype=np.int64)
+
+    def best_guess(self, answers, constraints=None):
+        """the optimal next guess when any of answers could still be the answer"""
+        _, guess = self.solve(self.subset(answers), constraints=constraints)
+        return self.guesses[guess]
+
+    def book(self, subset, guesses=(), codes=(), book=None, constraints=None):
+        """Policy entries (feedback path -> guess) for the optimal tree of a subset already solved"""
+        book = {} if book is None else book
+        _, guess = self.solve(subset, constraints=constraints)
+        word = self.guesses[guess]
+        book[path_key(guesses, codes)] = word
+        for code, group in self.split(subset, guess):
+            self.book(
+                group, [*guesses, word], [*codes, code], book, self.narrow(constraints, guess, code)
+            )
+        return book
+
+
+def _init_search(search):
+    global _worker_search
+    _worker_search = search
+
+
+def _root_guess_cost(subset, guess, beta):
+    """cost of guess at the root, with the tree below it if it got under beta"""
+    search = _worker_search
+    constraints = search.root_constraints()
+    cost = search.guess_cost(subset, guess, beta, constraints)
+    if cost >= beta:
+        return cost, None
+    word = search.guesses[guess]
+    book = {}
+    for code, group in search.split(subset, guess):
+        search.book(group, [word], [code], book, search.narrow(constraints, guess, code))
+    return cost, book
+
+
+def solve_root(search, max_workers=1):
+    """(cost, Policy book) of the optimal tree over all of search.answers. With max_workers > 1
+    first guesses are evaluated max_workers at a time against the best cost so far, in the same
+    order as the sequential search, so both find the same tree."""
+    subset = np.arange(len(search.answers))
+    constraints = search.root_constraints()
+    if max_workers <= 1:
+        cost, _ = search.solve(subset, constraints=constraints)
+        return cost, search.book(subset, constraints=constraints)
+
+    bounds = search.guess_bounds(subset, constraints)
+    order = [int(x) for x in np.argsort(bounds, kind='stable')]
+    best, best_guess, best_book = math.inf, None, None
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_search, initargs=(search,)
+    ) as executor:
+        for start in range(0, len(order), max_workers):
+            chunk = [x for x in order[start : start + max_workers] if bounds[x] < best]
+            if not chunk:
+                break
+            futures = [executor.submit(_root_guess_cost, subset, x, best) for x in chunk]
+            for guess, future in zip(chunk, futures):
+                cost, book = future.result()
+                if cost < best:
+                    best, best_guess, best_book = cost, guess, book
+    return best, {'': search.guesses[best_guess], **best_book}
+
+
+def build_optimal_policy(solver, objective='expected', max_workers=1):
+    """the optimal tree for solver's target_words, guessing from its short_words, as a Policy
+    that solver's play_game will follow (with no forced opening guess). In hard mode every
+    guess in the tree is legal on the path to it."""
+    search = OptimalSearch(
+        solver.get_pattern_matrix(),
+        solver.short_words,
+        sorted(solver.target_words),
+        objective,
+        hard_mode=bool(solver.hard_mode),
+        alphabet=solver.alphabet,
+    )
+    cost, book = solve_root(search, max_workers)
+    meta = {
+        'solver': type(solver).__name__,
+        'initial_guess': None,
+        'allow_counter_factual': True,
+        'hard_mode': bool(solver.hard_mode),
+        # play_game's default, the search doesn't use it
+        'guess_valid_only': False,
+        'decision_scope': solver.decision_scope,
+        'top_guess_count': solver.top_guess_count,
+        'strategy': get_strategy(solver.strategy).name,
+        **counter_factual_settings(solver),
+        'words_key': words_key(solver),
+        'objective': objective,
+        'cost': int(cost),
+    }
+    return Policy(book, meta)
+
+
+if __name__ == '__main__':
+    import wordle
+
+    parser = argparse.ArgumentParser(description='Search the optimal guess tree for a solver')
+    parser.add_argument('solver', type=str, help='solver class in wordle.py, e.g. WordleR')
+    parser.add_argument('--objective', choices=OBJECTIVES, default='expected')
+    parser.add_argument('--output', type=str, default=None, help='policy JSON file')
+    parser.add_argument('--workers', type=int, default=1, help='first guesses evaluated at once')
+    parser.add_argument(
+        '--hard-mode', action='store_true', default=False, help='only guess legal hard mode words'
+    )
+    parser.add_argument(
+        '--solver-kwargs', type=json.loads, default={}, help='JSON keyword arguments for the solver'
+    )
+    args = parser.parse_args()
+
+    solver = getattr(wordle, args.solver)(**{'log_level': 'WARNING', **args.solver_kwargs})
+    solver.hard_mode = args.hard_mode
+    policy = build_optimal_policy(solver, args.objective, max_workers=args.workers)
+    n_answers = len(solver.target_words)
+    output = args.output or f'optimal_{args.solver}_{args.objective}.json'
+    policy.save(output)
+    if args.objective == 'expected':
+        print(f'{policy.meta["cost"] / n_answers:.4f} guesses on average over {n_answers} answers')
+    else:
+        print(f'at most {policy.meta["cost"]} guesses over {n_answers} answers')
+    print(f'{len(policy.book)} decisions saved to {output}')
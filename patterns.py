@@ -0,0 +1,195 @@
+"""Precomputed guess x answer feedback patterns.
+
+A feedback line like ``[2, 0, 1, 0, 0]`` (the same numbers `Wordle.get_num_line` returns) is
+stored as a single base 3 code, position ``i`` contributing ``state * 3**i``, so every pattern
+fits in a uint8 (0-242) and the all green line is 242. The full matrix for a word list is
+computed in one vectorized pass and saved as an .npy file keyed by the word list contents.
+
+Other word lengths work the same way with codes up to ``3**length - 1``, in a uint16 from six
+letters on. `GameSpec` holds the alphabet and word length of a game and the pattern constants
+that follow from them.
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+import numpy as np
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+WORD_LENGTH = 5
+WINNING_CODE = 3**WORD_LENGTH - 1
+CACHE_DIR = '.wordle_cache'
+
+_loaded = {}
+
+
+def encode_words(words, alphabet=ALPHABET):
+    """turn a list of equal length words into a (n_words, word_length) uint8 array of letter indices,
+    or of the raw character bytes if alphabet is None"""
+    shape = (len(words), len(words[0]) if words else 0)
+    raw = np.frombuffer(''.join(words).encode('ascii'), dtype=np.uint8)
+    if alphabet is None:
+        return raw.reshape(shape)
+    lookup = np.full(256, 255, dtype=np.uint8)
+    for i, letter in enumerate(alphabet):
+        lookup[ord(letter)] = i
+    return lookup[raw].reshape(shape)
+
+
+def line_to_code(line):
+    return sum(int(x) * 3**i for i, x in enumerate(line))
+
+
+def code_to_line(code, length=WORD_LENGTH):
+    line = []
+    for _ in range(length):
+        code, state = divmod(int(code), 3)
+        line.append(state)
+    return line
+
+
+PATTERN_LINES = tuple(tuple(code_to_line(code)) for code in range(3**WORD_LENGTH))
+
+
+def pattern_dtype(length):
+    """the smallest unsigned type holding every pattern code for words of length letters"""
+    n_patterns = 3**length
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if n_patterns <= np.iinfo(dtype).max + 1:
+            return dtype
+    raise ValueError(f'words of {length} letters have too many feedback patterns')
+
+
+class GameSpec:
+    """The alphabet and word length of a game, with the feedback pattern constants for them"""
+
+    def __init__(self, alphabet=ALPHABET, length=WORD_LENGTH):
+        self.alphabet = alphabet
+        self.letter_index = {letter: i for i, letter in enumerate(alphabet)}
+        self.length = length
+        self.n_patterns = 3**length
+        self.winning_code = self.n_patterns - 1
+        self.winning_line = (2,) * length
+        self.dtype = pattern_dtype(length)
+        if (alphabet, length) == (ALPHABET, WORD_LENGTH):
+            self.pattern_lines = PATTERN_LINES
+        else:
+            self.pattern_lines = tuple(
+                tuple(code_to_line(code, length)) for code in range(self.n_patterns)
+            )
+
+    def __repr__(self):
+        return f'GameSpec({self.alphabet!r}, {self.length})'
+
+
+@lru_cache(maxsize=None)
+def get_spec(alphabet=ALPHABET, length=WORD_LENGTH):
+    """the GameSpec for alphabet and length, made once per process"""
+    return GameSpec(alphabet, length)
+
+
+def compute_patterns(guess_codes, answer_codes, chunk_size=128):
+    """Score every guess against every answer at once.
+
+    Yellows follow the same left to right rule as `Wordle.get_num_line`: a letter that isn't
+    green is yellow if the answer still has an unmatched copy of it after the greens and any
+    earlier yellows of the same letter have been accounted for."""
+    n_guesses, length = guess_codes.shape
+    dtype = pattern_dtype(length)
+    out = np.empty((n_guesses, len(answer_codes)), dtype=dtype)
+    answers = answer_codes[None, :, :]
+    for start in range(0, n_guesses, chunk_size):
+        guesses = guess_codes[start : start + chunk_size, None, :]
+        green = guesses == answers
+        not_green = ~green
+        codes = np.zeros(green.shape[:2], dtype=dtype)
+        for i in range(length):
+            letter = guesses[:, :, i]
+            available = ((answers == letter[..., None]) & not_green).sum(axis=-1)
+            used = np.zeros_like(available)
+            for j in range(i):
+                used += (guesses[:, :, j] == letter) & not_green[:, :, j]
+            yellow = not_green[:, :, i] & (used < available)
+            codes += (2 * green[:, :, i] + yellow).astype(dtype) * dtype(3**i)
+        out[start : start + chunk_size] = codes
+    return out
+
+
+def pattern_histograms(codes, length=WORD_LENGTH):
+    """(n_guesses, 3**length) counts of each pattern code in each row of a codes matrix, i.e. the
+    size of every feedback bucket each guess splits the answers into"""
+    n_patterns = 3**length
+    offsets = codes.astype(np.int64) + n_patterns * np.arange(len(codes))[:, None]
+    return np.bincount(offsets.ravel(), minlength=len(codes) * n_patterns).reshape(
+        len(codes), n_patterns
+    )
+
+
+def cache_key(guesses, answers):
+    digest = hashlib.sha1()
+    digest.update('\n'.join(guesses).encode())
+    digest.update(b'|')
+    digest.update('\n'.join(answers).encode())
+    return digest.hexdigest()
+
+
+class PatternMatrix:
+    """The feedback code for every (guess, answer) pair of a word list.
+
+    Rows are guesses and columns answers, both in sorted order so the same lists always
+    produce the same file no matter how the solver happened to order them."""
+
+    def __init__(self, guesses, answers, matrix=None):
+        self.guesses = sorted(set(guesses))
+        self.answers = sorted(set(answers))
+        self.guess_index = {word: i for i, word in enumerate(self.guesses)}
+        self.answer_index = {word: i for i, word in enumerate(self.answers)}
+        if matrix is None:
+            matrix = compute_patterns(
+                encode_words(self.guesses, None), encode_words(self.answers, None)
+            )
+        self.matrix = matrix
+
+    @classmethod
+    def load(cls, guesses, answers, cache_dir=CACHE_DIR):
+        """load the matrix for these word lists from the .npy cache, building and saving it on a miss.
+        Matrices are also kept per process so repeated solvers share one copy."""
+        guesses = sorted(set(guesses))
+        answers = sorted(set(answers))
+        key = cache_key(guesses, answers)
+        if key in _loaded:
+            return _loaded[key]
+        path = os.path.join(cache_dir, f'patterns_{key}.npy') if cache_dir else None
+        if path and os.path.exists(path):
+            patterns = cls(guesses, answers, np.load(path, mmap_mode='r'))
+        else:
+            patterns = cls(guesses, answers)
+            if path:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+                np.save(tmp_path, patterns.matrix)
+                os.replace(tmp_path, path)
+        _loaded[key] = patterns
+        return patterns
+
+    def code(self, guess, answer):
+        """the pattern code, or None if either word isn't covered by the matrix"""
+        g = self.guess_index.get(guess)
+        a = self.answer_index.get(answer)
+        if g is None or a is None:
+            return None
+        return int(self.matrix[g, a])
+
+    def subset(self, guesses, answers):
+        """the PatternMatrix of word lists this one covers, sliced from its codes"""
+        guesses = sorted(set(guesses))
+        answers = sorted(set(answers))
+        return PatternMatrix(guesses, answers, self.submatrix(guesses, answers))
+
+    def submatrix(self, guesses, answers):
+        """(len(guesses), len(answers)) pattern codes, computed directly if any word isn't covered"""
+        rows = [self.guess_index.get(x) for x in guesses]
+        cols = [self.answer_index.get(x) for x in answers]
+        if None in rows or None in cols:
+            return compute_patterns(encode_words(guesses, None), encode_words(answers, None))
+        return np.asarray(self.matrix[np.ix_(rows, cols)])
@@ -0,0 +1,203 @@
+"""Precomputed decision trees ("opening books") for a solver and opening guess.
+
+With a fixed opening guess a solver's guesses depend only on the feedback it has had so far,
+so its whole strategy over target_words can be worked out once: start from the opening, split
+the answers by the feedback the guess gives, work out the next guess for each group from the
+state that feedback leaves behind, and repeat until every answer is found. The result maps each
+feedback path to the next guess, and `Wordle.play_game` consults it before computing anything.
+
+    python policy.py WordNetWordle2 --initial-guess raise --output wnw2_raise.json
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from copy import deepcopy
+
+import numpy as np
+
+from patterns import cache_key, line_to_code
+from strategies import get_strategy
+
+# everything init_game, generate_guess and evaluate_round change during a game
+GAME_KEYS = (
+    'answer',
+    'game_state',
+    'guesses',
+    'success_grid',
+    'luck_factor',
+    'luck_factor_flag',
+    'final_list_length',
+    'word_list_length',
+    'remaining_words',
+    'augmented_guess_count',
+)
+
+# counterfactual settings that change decisions, with the defaults books built before they
+# were recorded were made with
+COUNTER_FACTUAL_SETTINGS = {
+    'counter_factual_mode': 'partition',
+    'counter_factual_batch_size': 512,
+    'counter_factual_time_budget': None,
+}
+
+_builder_solver = None
+
+
+def path_key(guesses, codes):
+    return ' '.join(f'{guess}:{code}' for guess, code in zip(guesses, codes))
+
+
+def counter_factual_settings(solver):
+    return {k: getattr(solver, k) for k in COUNTER_FACTUAL_SETTINGS}
+
+
+def words_key(solver):
+    return cache_key(sorted(set(solver.short_words)), sorted(set(solver.target_words)))
+
+
+class Policy:
+    """next guess for every feedback path, plus the settings it was built with"""
+
+    def __init__(self, book, meta):
+        self.book = book
+        self.meta = meta
+
+    def applies_to(self, solver):
+        """whether solver, in the game it has just started, would make the decisions in the book"""
+        return (
+            type(solver).__name__ == self.meta['solver']
+            and solver.force_init_guess == self.meta['initial_guess']
+            and bool(solver.allow_counter_factual) == self.meta['allow_counter_factual']
+            and bool(solver.hard_mode) == self.meta['hard_mode']
+            and bool(solver.guess_valid_only) == self.meta.get('guess_valid_only', False)
+            and solver.decision_scope == self.meta.get('decision_scope', '')
+            and solver.top_guess_count == self.meta['top_guess_count']
+            and get_strategy(solver.strategy).name == self.meta.get('strategy', 'mean')
+            and all(
+                getattr(solver, k) == self.meta.get(k, default)
+                for k, default in COUNTER_FACTUAL_SETTINGS.items()
+            )
+            and words_key(solver) == self.meta['words_key']
+        )
+
+    def lookup(self, guesses, success_grid):
+        return self.book.get(path_key(guesses, [line_to_code(x) for x in success_grid]))
+
+    def save(self, path):
+        # written whole, an interrupted save leaves the old file
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'meta': self.meta, 'book': self.book}, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data['book'], data['meta'])
+
+
+def snapshot(solver):
+    return deepcopy({key: getattr(solver, key) for key in GAME_KEYS})
+
+
+def expand(solver, i, answers, book):
+    """Record the solver's guess for round i at its current state, then do the same for every
+    feedback the guess can get from answers, the answers still consistent with the path."""
+    guess = solver.next_guess(i)
+    codes = [line_to_code(x) for x in solver.success_grid]
+    book[path_key(solver.guesses, codes)] = guess
+    state = snapshot(solver)
+    for code, group in split_answers(solver, guess, answers):
+        if code == solver.spec.winning_code:
+            continue
+        play_feedback(solver, state, guess, group[0])
+        expand(solver, i + 1, group, book)
+    return book
+
+
+def split_answers(solver, guess, answers):
+    """(pattern code, answers giving it) for every feedback guess can get"""
+    codes = solver.get_pattern_matrix().submatrix([guess], answers)[0]
+    answers = np.asarray(answers)
+    return [(int(code), answers[codes == code].tolist()) for code in np.unique(codes)]
+
+
+def play_feedback(solver, state, guess, answer):
+    """restore state and play guess as if answer were the target, like a round of play_game"""
+    for key, val in deepcopy(state).items():
+        setattr(solver, key, val)
+    solver.answer = answer
+    solver.evaluate_round(guess)
+    solver.final_list_length = len(solver.remaining_words)
+    solver.word_list_length.append(solver.final_list_length)
+
+
+def _init_builder(solver):
+    global _builder_solver
+    _builder_solver = solver
+
+
+def _expand_branch(state, guess, answers, i):
+    play_feedback(_builder_solver, state, guess, answers[0])
+    return expand(_builder_solver, i, answers, {})
+
+
+def build_policy(solver, initial_guess, allow_counter_factual=True, max_workers=1):
+    """the solver's full decision tree over its target_words, starting with initial_guess.
+    With max_workers > 1 the branches after the opening guess are expanded in parallel."""
+    answers = sorted(solver.target_words)
+    solver.init_game(
+        answers[0], force_init_guess=initial_guess, allow_counter_factual=allow_counter_factual
+    )
+    solver.wordle_num = ''
+    meta = {
+        'solver': type(solver).__name__,
+        'initial_guess': initial_guess,
+        'allow_counter_factual': bool(allow_counter_factual),
+        'hard_mode': bool(solver.hard_mode),
+        'guess_valid_only': bool(solver.guess_valid_only),
+        'decision_scope': solver.decision_scope,
+        'top_guess_count': solver.top_guess_count,
+        'strategy': get_strategy(solver.strategy).name,
+        **counter_factual_settings(solver),
+        'words_key': words_key(solver),
+    }
+    if max_workers <= 1:
+        return Policy(expand(solver, 1, answers, {}), meta)
+
+    guess = solver.next_guess(1)
+    book = {'': guess}
+    state = snapshot(solver)
+    winning_code = solver.spec.winning_code
+    branches = [x for x in split_answers(solver, guess, answers) if x[0] != winning_code]
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_builder, initargs=(solver,)
+    ) as executor:
+        futures = [
+            executor.submit(_expand_branch, state, guess, group, 2) for _, group in branches
+        ]
+        for future in futures:
+            book.update(future.result())
+    return Policy(book, meta)
+
+
+if __name__ == '__main__':
+    import wordle
+
+    parser = argparse.ArgumentParser(description='Precompute a solver\'s decision tree')
+    parser.add_argument('solver', type=str, help='solver class in wordle.py, e.g. WordNetWordle2')
+    parser.add_argument('--initial-guess', type=str, required=True, help='forced opening word')
+    parser.add_argument('--output', type=str, default=None, help='policy JSON file')
+    parser.add_argument('--workers', type=int, default=1, help='branches expanded at once')
+    parser.add_argument(
+        '--solver-kwargs', type=json.loads, default={}, help='JSON keyword arguments for the solver'
+    )
+    args = parser.parse_args()
+
+    solver = getattr(wordle, args.solver)(**{'log_level': 'WARNING', **args.solver_kwargs})
+    policy = build_policy(solver, args.initial_guess, max_workers=args.workers)
+    output = args.output or f'policy_{args.solver}_{args.initial_guess}.json'
+    policy.save(output)
+    print(f'{len(policy.book)} decisions saved to {output}')
@@ -0,0 +1,162 @@
+"""A long lived worker pool for the counterfactual work.
+
+The pool is started once per solver and reused across rounds and games. The large read only
+tables (short_words, target_words, commonality and the pattern matrix) are published to the
+workers once through shared memory, so each task only carries the small per round game state.
+"""
+import math
+import time
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from patterns import PatternMatrix, cache_key, encode_words
+
+# solver attributes the workers get from shared memory (or don't need) rather than from each task
+SHARED_KEYS = (
+    'short_words',
+    'target_words',
+    'commonality',
+    'pattern_matrix',
+    'word_array',
+    'word_codes',
+    'guess_array',
+    'legal_guesses',
+    'letter_counts',
+    'frequency_counts',
+    'policy',
+    'decision_cache',
+    'metrics',
+    'trace',
+    'rollouts',
+)
+
+_worker_solver = None
+_worker_blocks = []
+
+
+def share_array(array):
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def attach_array(descriptor):
+    name, shape, dtype = descriptor
+    block = shared_memory.SharedMemory(name=name)
+    # the array is only valid while the mapping is open, so keep it for the life of the worker
+    _worker_blocks.append(block)
+    return np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def decode_words(array):
+    n_words, length = array.shape
+    text = array.tobytes().decode('ascii')
+    return [text[i * length : (i + 1) * length] for i in range(n_words)]
+
+
+def fingerprint(solver):
+    """changes whenever the tables published to the workers would be different"""
+    return cache_key(solver.short_words, solver.target_words), len(solver.commonality)
+
+
+def _init_worker(cls, descriptors):
+    global _worker_solver
+    tables = {key: attach_array(descriptor) for key, descriptor in descriptors.items()}
+    solver = object.__new__(cls)
+    solver.short_words = decode_words(tables['short_words'])
+    solver.target_words = decode_words(tables['target_words'])
+    solver.commonality = dict(
+        zip(decode_words(tables['commonality_words']), tables['commonality_counts'].tolist())
+    )
+    solver.pattern_matrix = PatternMatrix(
+        decode_words(tables['pattern_guesses']),
+        decode_words(tables['pattern_answers']),
+        tables['patterns'],
+    )
+    _worker_solver = solver
+
+
+def _run_chunk(round_state, method, chunk, kwargs):
+    start = time.perf_counter()
+    _worker_solver.__dict__.update(round_state)
+    func = getattr(_worker_solver, method)
+    return [func(item, **kwargs) for item in chunk], time.perf_counter() - start
+
+
+def _release(executor, blocks):
+    executor.shutdown(cancel_futures=True)
+    for block in blocks:
+        block.close()
+        block.unlink()
+    blocks.clear()
+
+
+class SolverPool:
+    """Process pool whose workers each hold a copy of the solver built from shared memory.
+
+    Use `map` to call a solver method on every item; the current game state is sent along
+    with each chunk of items and applied to the worker's solver before running it."""
+
+    def __init__(self, solver, max_workers=10, chunks_per_worker=4):
+        self.max_workers = max_workers
+        self.last_map = None
+        self.chunks_per_worker = chunks_per_worker
+        self.fingerprint = fingerprint(solver)
+        patterns = solver.get_pattern_matrix()
+        commonality_words = list(solver.commonality)
+        tables = {
+            'short_words': encode_words(solver.short_words, None),
+            'target_words': encode_words(solver.target_words, None),
+            'commonality_words': encode_words(commonality_words, None),
+            'commonality_counts': np.array(
+                [solver.commonality[x] for x in commonality_words], dtype=np.int64
+            ),
+            'pattern_guesses': encode_words(patterns.guesses, None),
+            'pattern_answers': encode_words(patterns.answers, None),
+            'patterns': np.asarray(patterns.matrix),
+        }
+        self.blocks = []
+        descriptors = {}
+        for key, array in tables.items():
+            block, descriptors[key] = share_array(array)
+            self.blocks.append(block)
+        self.executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(type(solver), descriptors),
+        )
+        self._finalizer = weakref.finalize(self, _release, self.executor, self.blocks)
+
+    def map(self, solver, method, items, **kwargs):
+        """solver.method(item, **kwargs) for every item, computed on the workers, in order.
+        Once all of them have been read, last_map has how busy the workers were."""
+        start = time.perf_counter()
+        items = list(items)
+        round_state = {
+            key: val for key, val in solver.__getstate__().items() if key not in SHARED_KEYS
+        }
+        size = max(1, math.ceil(len(items) / (self.max_workers * self.chunks_per_worker)))
+        futures = [
+            self.executor.submit(_run_chunk, round_state, method, items[i : i + size], kwargs)
+            for i in range(0, len(items), size)
+        ]
+        busy = 0.0
+        for future in futures:
+            results, seconds = future.result()
+            busy += seconds
+            yield from results
+        wall = time.perf_counter() - start
+        self.last_map = {
+            'tasks': len(futures),
+            'items': len(items),
+            'busy_seconds': busy,
+            'wall_seconds': wall,
+            'utilization': busy / (wall * self.max_workers) if wall else 0.0,
+        }
+
+    def close(self):
+        self._finalizer()
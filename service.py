@@ -0,0 +1,324 @@
+"""A resident solver that answers "what next?" for games it doesn't know the answer to.
+
+The server keeps solvers loaded in worker processes and takes the rounds played so far, each a
+guess and the feedback it got ('20100', [2, 0, 1, 0, 0] or the squares), returning the next
+guess and how many target words still fit. Sessions hold their rounds so a client only sends
+the newest one. Decisions only depend on the rounds, so they're cached across sessions and
+identical requests in flight are computed once. The event loop never runs a solver, so slow
+rounds only hold up their own requests, workers at a time.
+
+    python service.py WordNetWordle2 --initial-guess raise --workers 4 --port 8080
+
+    POST /sessions                        {}                                    -> session, guess
+    POST /sessions/<id>/feedback          {"guess": "raise", "feedback": "00120"}
+    DELETE /sessions/<id>
+    POST /guess                           {"rounds": [["raise", "00120"]]}     stateless
+    GET /health
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import wordle
+from patterns import line_to_code
+from policy import path_key
+
+SQUARES = {'⬜': 0, '⬛': 0, '🟨': 1, '🟩': 2}
+STATUS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+}
+
+_solver = None
+
+
+def parse_feedback(feedback, length):
+    """a score line (list of 0, 1 and 2) from a string of digits or squares, or a list"""
+    if isinstance(feedback, str):
+        line = [SQUARES.get(x, x) for x in feedback if not x.isspace()]
+    else:
+        line = list(feedback)
+    line = [int(x) if str(x) in ('0', '1', '2') else None for x in line]
+    if len(line) != length or None in line:
+        raise ValueError(f'feedback {feedback!r} is not {length} of 0, 1 and 2')
+    return line
+
+
+def parse_guess(guess, word_length, words):
+    guess = str(guess).strip().lower()
+    if len(guess) != word_length or guess not in words:
+        raise ValueError(f'{guess!r} is not an allowed guess')
+    return guess
+
+
+def parse_rounds(rounds, word_length, words):
+    """(guess, score line) pairs from (guess, feedback) pairs, each guess one of words"""
+    return [
+        (parse_guess(guess, word_length, words), parse_feedback(feedback, word_length))
+        for guess, feedback in rounds
+    ]
+
+
+def _init_worker(solver_name, solver_kwargs, policy):
+    global _solver
+    _solver = getattr(wordle, solver_name)(**solver_kwargs)
+    if policy:
+        _solver.load_policy(policy)
+
+
+def next_guess(w, rounds, initial_guess=None):
+    """The guess play_game would make after rounds, (guess, score line) pairs, and the number
+    of target words that fit them, without knowing the answer."""
+    w.init_game(None, force_init_guess=initial_guess, allow_counter_factual=True)
+    w.wordle_num = ''
+    for guess, line in rounds:
+        # leave remaining_words where play_game would have
+        w.remaining_words = [x[0] for x in w.make_matching_short_words()]
+        if w.apply_feedback(guess, line) == 'Winner':
+            return {'guess': None, 'remaining': 0, 'solved': True}
+    remaining = [x[0] for x in w.make_matching_short_words()]
+    if not remaining:
+        raise ValueError('no target word fits the feedback')
+    i = len(rounds) + 1
+    policy = w.policy if w.policy is not None and w.policy.applies_to(w) else None
+    guess = policy.lookup(w.guesses, w.success_grid) if policy else None
+    if guess is None:
+        guess = w.next_guess(i)
+    return {
+        'guess': guess,
+        'remaining': len(remaining),
+        'solved': False,
+        'candidates': remaining[:10],
+    }
+
+
+def _next_guess(rounds, initial_guess):
+    return next_guess(_solver, rounds, initial_guess)
+
+
+def _allowed_guesses():
+    return _solver.word_length, list(_solver.short_words)
+
+
+class SolverService:
+    """Sessions and cached decisions in front of a pool of processes with loaded solvers"""
+
+    def __init__(
+        self,
+        solver_name,
+        solver_kwargs=None,
+        workers=1,
+        initial_guess=None,
+        policy=None,
+        session_ttl=3600,
+        cache_size=100_000,
+    ):
+        self.initial_guess = initial_guess
+        self.session_ttl = session_ttl
+        self.cache_size = cache_size
+        self.executor = ProcessPoolExecutor(
+            workers,
+            initializer=_init_worker,
+            initargs=(solver_name, {'log_level': 'WARNING', **(solver_kwargs or {})}, policy),
+        )
+        self.allowed = None
+        self.sessions = {}
+        self.decisions = OrderedDict()
+        self.pending = {}
+        self.computed = 0
+        self.cache_hits = 0
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    async def allowed_guesses(self):
+        """(word length, set of allowed guesses) of the worker solvers"""
+        if self.allowed is None:
+            word_length, words = await asyncio.get_running_loop().run_in_executor(
+                self.executor, _allowed_guesses
+            )
+            self.allowed = word_length, set(words)
+        return self.allowed
+
+    async def parse_request(self, rounds, initial_guess):
+        """parse_rounds and the opening guess, if one is given"""
+        allowed = await self.allowed_guesses()
+        if initial_guess is not None:
+            initial_guess = parse_guess(initial_guess, *allowed)
+        return parse_rounds(rounds, *allowed), initial_guess
+
+    async def next_guess(self, rounds, initial_guess=None):
+        """the next guess after rounds, from the cache, a computation already running for the
+        same rounds or a worker"""
+        initial_guess = initial_guess or self.initial_guess
+        codes = [line_to_code(x) for _, x in rounds]
+        key = (initial_guess, path_key([x for x, _ in rounds], codes))
+        if key in self.decisions:
+            self.decisions.move_to_end(key)
+            self.cache_hits += 1
+            return self.decisions[key]
+        future = self.pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.executor, _next_guess, rounds, initial_guess
+            )
+            future.add_done_callback(lambda x: self.store(key, x))
+            self.pending[key] = future
+        else:
+            self.cache_hits += 1
+        # a request going away doesn't cancel the computation the others are waiting for
+        return await asyncio.shield(future)
+
+    def store(self, key, future):
+        del self.pending[key]
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.computed += 1
+        self.decisions[key] = future.result()
+        if len(self.decisions) > self.cache_size:
+            self.decisions.popitem(last=False)
+
+    def expire_sessions(self):
+        now = time.monotonic()
+        for session_id in [
+            k for k, v in self.sessions.items() if now - v['last_used'] > self.session_ttl
+        ]:
+            del self.sessions[session_id]
+
+    async def start_session(self, initial_guess=None):
+        self.expire_sessions()
+        session = {
+            'rounds': [],
+            'initial_guess': initial_guess or self.initial_guess,
+            'last_used': time.monotonic(),
+            # held while a round is added, so concurrent feedback can't drop one
+            'lock': asyncio.Lock(),
+        }
+        result = await self.next_guess([], session['initial_guess'])
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = session
+        return {'session': session_id, **result}
+
+    async def add_feedback(self, session_id, guess, feedback):
+        session = self.sessions[session_id]
+        session['last_used'] = time.monotonic()
+        new_round, _ = await self.parse_request([(guess, feedback)], None)
+        async with session['lock']:
+            rounds = session['rounds'] + new_round
+            result = await self.next_guess(rounds, session['initial_guess'])
+            # only kept once the feedback made sense
+            session['rounds'] = rounds
+        return {'session': session_id, 'round': len(rounds) + 1, **result}
+
+    async def handle(self, method, path, body):
+        """(status, response) for a request"""
+        parts = [x for x in path.split('?')[0].split('/') if x]
+        if not isinstance(body, dict):
+            return 400, {'error': 'the body must be a JSON object'}
+        try:
+            if parts == ['health'] and method == 'GET':
+                return 200, {
+                    'sessions': len(self.sessions),
+                    'cached_decisions': len(self.decisions),
+                    'computed': self.computed,
+                    'cache_hits': self.cache_hits,
+                }
+            if parts == ['guess'] and method == 'POST':
+                rounds, initial_guess = await self.parse_request(
+                    body.get('rounds', []), body.get('initial_guess')
+                )
+                return 200, await self.next_guess(rounds, initial_guess)
+            if parts == ['sessions'] and method == 'POST':
+                _, initial_guess = await self.parse_request([], body.get('initial_guess'))
+                return 200, await self.start_session(initial_guess)
+            if len(parts) >= 2 and parts[0] == 'sessions':
+                if parts[1] not in self.sessions:
+                    return 404, {'error': f'no session {parts[1]}'}
+                if parts[2:] == ['feedback'] and method == 'POST':
+                    return 200, await self.add_feedback(parts[1], body['guess'], body['feedback'])
+                if len(parts) == 2 and method == 'DELETE':
+                    del self.sessions[parts[1]]
+                    return 200, {'session': parts[1], 'deleted': True}
+                if len(parts) == 2 and method == 'GET':
+                    session = self.sessions[parts[1]]
+                    return 200, {'session': parts[1], 'rounds': session['rounds']}
+            return 404, {'error': f'no route for {method} {path}'}
+        except (KeyError, TypeError, ValueError, AssertionError) as e:
+            # the solver asserts on feedback that no word could give
+            return 400, {'error': str(e) or type(e).__name__}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+
+    async def handle_connection(self, reader, writer):
+        """HTTP/1.1 with JSON bodies, keeping the connection open between requests"""
+        try:
+            while request_line := await reader.readline():
+                method, path, _ = request_line.decode().split(' ', 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                data = await reader.readexactly(int(headers.get('content-length', 0)))
+                try:
+                    body = json.loads(data) if data else {}
+                except json.JSONDecodeError as e:
+                    status, response = 400, {'error': f'invalid JSON: {e}'}
+                else:
+                    status, response = await self.handle(method, path, body)
+                payload = json.dumps(response).encode()
+                writer.write(
+                    f'HTTP/1.1 {status} {STATUS[status]}\r\n'
+                    'Content-Type: application/json\r\n'
+                    f'Content-Length: {len(payload)}\r\n\r\n'.encode()
+                    + payload
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        # loads the solvers and caches the opening guess before taking requests
+        await self.next_guess([])
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f'serving on http://{host}:{port}', flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve next guesses for games in progress')
+    parser.add_argument('solver', type=str, help='solver class in wordle.py, e.g. WordNetWordle2')
+    parser.add_argument('--initial-guess', type=str, default=None, help='forced opening word')
+    parser.add_argument('--policy', type=str, default=None, help='precomputed policy file')
+    parser.add_argument('--workers', type=int, default=1, help='rounds computed at once')
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument(
+        '--solver-kwargs', type=json.loads, default={}, help='JSON keyword arguments for the solver'
+    )
+    args = parser.parse_args()
+
+    service = SolverService(
+        args.solver,
+        args.solver_kwargs,
+        workers=args.workers,
+        initial_guess=args.initial_guess,
+        policy=args.policy,
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
@@ -0,0 +1,301 @@
+"""A backtest split into shards that workers on any number of machines claim from a queue
+directory on a shared filesystem.
+
+    python shards.py create queue WordNetWordle3 wordle_answers.txt --initial-guess raise
+    python shards.py work queue --workers 8        # on every machine taking part
+    python shards.py status queue
+    python shards.py merge queue --output wnw3.jsonl
+
+A worker claims a shard by creating its claim file, which fails if another worker got there
+first, and keeps touching the file while it plays. A claim that hasn't been touched for
+stale_after seconds belongs to a worker that died or lost the filesystem, and the next worker
+looking for work takes the shard over by creating the claim of the next generation, which again
+only one can. Ages are measured on the shared filesystem's clock rather than each host's.
+
+A shard's result lines are written to a temporary file and renamed into place once it's done,
+so a shard played twice (by a slow worker and the one that took it over) leaves one complete
+copy. merge appends the games not yet in the output file in answer order, the same lines a
+single machine run of backtest.py (or compare.py, for a strategy with settings) writes.
+"""
+import argparse
+import glob
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from backtest import end_last_line, read_answers, remaining_answers, run_config, with_defaults
+from compare import _init_worker, parse_strategy, play_strategy, strategy_label
+
+
+class ShardQueue:
+    """A queue directory: job.json with the run, shards/ with each shard's answers, claims/
+    with a file per claim generation of a shard and results/ with the finished shards"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def file(self, *parts):
+        return os.path.join(self.path, *parts)
+
+    def create(
+        self,
+        strategy,
+        answers,
+        shard_size=50,
+        initial_guess=None,
+        solver_kwargs=None,
+        hard_mode=False,
+    ):
+        """Split answers into shards of shard_size for strategy, a solver class name optionally
+        with settings as compare.py takes them. Returns the number of shards."""
+        if os.path.exists(self.file('job.json')):
+            raise FileExistsError(f'{self.path} already has a job')
+        answers = list(dict.fromkeys(answers))
+        shards = [answers[i : i + shard_size] for i in range(0, len(answers), shard_size)]
+        for name in ('shards', 'claims', 'results'):
+            os.makedirs(self.file(name), exist_ok=True)
+        for i, shard in enumerate(shards):
+            self.write(self.file('shards', f'{i:05d}.json'), json.dumps(shard))
+        solver_name, settings = parse_strategy(strategy)
+        job = {
+            'strategy': strategy,
+            'answers': answers,
+            'shards': len(shards),
+            'config': run_config(
+                solver_name, initial_guess, with_defaults(solver_kwargs), hard_mode, settings
+            ),
+        }
+        # written last, workers only start once the shards are all there
+        self.write(self.file('job.json'), json.dumps(job))
+        return len(shards)
+
+    def write(self, path, text):
+        """write a whole file at once, so readers never see part of it"""
+        tmp_path = f'{path}.{socket.gethostname()}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def job(self):
+        with open(self.file('job.json')) as f:
+            return json.load(f)
+
+    def answers(self, shard):
+        with open(self.file('shards', f'{shard:05d}.json')) as f:
+            return json.load(f)
+
+    def done(self, shard):
+        return os.path.exists(self.file('results', f'{shard:05d}.jsonl'))
+
+    def now(self):
+        """the time on the shared filesystem's clock"""
+        path = self.file('clock')
+        with open(path, 'a'):
+            os.utime(path)
+        return os.stat(path).st_mtime
+
+    def claims(self, shard):
+        """the shard's claim files, newest generation last"""
+        return sorted(glob.glob(self.file('claims', f'{shard:05d}.*')))
+
+    def claim(self, shard, worker, stale_after):
+        """the path of a new claim of shard for worker, or None if it's done or another
+        worker's claim is still fresh"""
+        if self.done(shard):
+            return None
+        claims = self.claims(shard)
+        if claims:
+            try:
+                age = self.now() - os.stat(claims[-1]).st_mtime
+            except FileNotFoundError:
+                return None
+            if age < stale_after:
+                return None
+            generation = int(claims[-1].rsplit('.', 1)[1]) + 1
+        else:
+            generation = 0
+        path = self.file('claims', f'{shard:05d}.{generation:03d}')
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            # another worker claimed it first
+            return None
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'worker': worker, 'claimed': time.time()}, f)
+        return path
+
+    def next_shard(self, worker, stale_after):
+        """(shard, claim path) of the first shard worker could claim, or None"""
+        for shard in range(self.job()['shards']):
+            path = self.claim(shard, worker, stale_after)
+            if path:
+                return shard, path
+        return None
+
+    def finish(self, shard, lines):
+        self.write(self.file('results', f'{shard:05d}.jsonl'), ''.join(lines))
+
+    def status(self, stale_after=60):
+        """the number of shards done, being played and waiting to be (re)claimed"""
+        counts = {'done': 0, 'claimed': 0, 'waiting': 0}
+        now = self.now()
+        for shard in range(self.job()['shards']):
+            claims = self.claims(shard)
+            if self.done(shard):
+                counts['done'] += 1
+            elif claims and now - os.stat(claims[-1]).st_mtime < stale_after:
+                counts['claimed'] += 1
+            else:
+                counts['waiting'] += 1
+        return counts
+
+    def results(self):
+        """every finished shard's result lines"""
+        lines = []
+        for path in sorted(glob.glob(self.file('results', '*.jsonl'))):
+            with open(path) as f:
+                lines.extend(json.loads(x) for x in f if x.strip())
+        return lines
+
+    def merge(self, output):
+        """Append the games of the finished shards that aren't in output yet, in the job's
+        answer order. Returns the number of lines written."""
+        job = self.job()
+        config = job['config']
+        todo = set(remaining_answers(output, config, job['answers']))
+        records = {x['answer']: x for x in self.results() if x['answer'] in todo}
+        end_last_line(output)
+        with open(output, 'a') as f:
+            for answer in job['answers']:
+                if answer in records:
+                    f.write(json.dumps(records[answer]) + '\n')
+        return len(records)
+
+
+class Heartbeat(threading.Thread):
+    """touches a claim every interval seconds until stopped"""
+
+    def __init__(self, path, interval):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                return
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_worker(queue, max_workers=1, heartbeat=10, stale_after=60, poll=5, worker=None):
+    """Claim and play shards of the queue until every shard is done, with one solver per
+    process loaded once for all of them. Returns the number of shards played."""
+    queue = ShardQueue(queue) if isinstance(queue, str) else queue
+    worker = worker or f'{socket.gethostname()}-{os.getpid()}'
+    job = queue.job()
+    config = job['config']
+    strategy = (config['solver'], config['settings'])
+    label = strategy_label(*strategy)
+    played = 0
+    with ProcessPoolExecutor(
+        max_workers,
+        initializer=_init_worker,
+        initargs=(
+            [strategy],
+            config['solver_kwargs'],
+            config['hard_mode'],
+            None,
+            None,
+            None,
+            None,
+        ),
+    ) as executor:
+        while not all(queue.done(x) for x in range(job['shards'])):
+            claimed = queue.next_shard(worker, stale_after)
+            if claimed is None:
+                # the rest are being played, wait for them to finish or go stale
+                time.sleep(poll)
+                continue
+            shard, path = claimed
+            beat = Heartbeat(path, heartbeat)
+            beat.start()
+            try:
+                futures = [
+                    executor.submit(play_strategy, label, x, config['initial_guess'])
+                    for x in queue.answers(shard)
+                ]
+                lines = [json.dumps({**config, **x.result()}) + '\n' for x in futures]
+                queue.finish(shard, lines)
+            finally:
+                beat.stop()
+            played += 1
+            print(f'{worker} finished shard {shard}', flush=True)
+    return played
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Backtests in shards across machines')
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create', help='split a backtest into a new queue')
+    create.add_argument('queue', type=str, help='queue directory on a shared filesystem')
+    create.add_argument(
+        'solver',
+        type=str,
+        help='solver class in wordle.py, optionally with settings as compare.py takes them',
+    )
+    create.add_argument('answers', type=str, help='file with one answer per line')
+    create.add_argument('--shard-size', type=int, default=50, help='answers per shard')
+    create.add_argument('--initial-guess', type=str, default=None, help='forced opening word')
+    create.add_argument(
+        '--solver-kwargs', type=json.loads, default={}, help='JSON keyword arguments for the solver'
+    )
+    create.add_argument(
+        '--hard-mode', action='store_true', default=False, help='play by hard mode rules'
+    )
+    work = commands.add_parser('work', help='play shards until the queue is done')
+    work.add_argument('queue', type=str)
+    work.add_argument('--workers', type=int, default=1, help='games played at once')
+    work.add_argument('--heartbeat', type=float, default=10, help='seconds between touches')
+    work.add_argument(
+        '--stale-after', type=float, default=60, help='seconds before a claim is taken over'
+    )
+    status = commands.add_parser('status', help='count the shards done and being played')
+    status.add_argument('queue', type=str)
+    status.add_argument('--stale-after', type=float, default=60)
+    merge = commands.add_parser('merge', help='append the finished shards to a results file')
+    merge.add_argument('queue', type=str)
+    merge.add_argument('--output', type=str, required=True, help='JSONL results file')
+    args = parser.parse_args()
+
+    queue = ShardQueue(args.queue)
+    if args.command == 'create':
+        shards = queue.create(
+            args.solver,
+            read_answers(args.answers),
+            shard_size=args.shard_size,
+            initial_guess=args.initial_guess,
+            solver_kwargs=args.solver_kwargs,
+            hard_mode=args.hard_mode,
+        )
+        print(f'{shards} shards in {args.queue}')
+    elif args.command == 'work':
+        played = run_worker(
+            queue, args.workers, heartbeat=args.heartbeat, stale_after=args.stale_after
+        )
+        print(f'played {played} shards')
+    elif args.command == 'status':
+        print(queue.status(args.stale_after))
+    else:
+        status = queue.status()
+        if status['done'] < sum(status.values()):
+            print(f'only {status["done"]} of {sum(status.values())} shards are done')
+        print(f'added {queue.merge(args.output)} games to {args.output}')
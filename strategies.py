@@ -0,0 +1,200 @@
+"""Ways of ranking candidate guesses from how they split the remaining words.
+
+Everything a strategy needs is in the feedback bucket histogram of each candidate: how many of
+the remaining words give each pattern, and how many words would be left after it. A strategy
+turns those into sort keys for all candidates at once and the best candidate is the one that
+sorts first, so trying a new statistic means adding a strategy, not a subclass.
+"""
+import numpy as np
+
+from patterns import WORD_LENGTH, pattern_histograms
+
+
+class Partitions:
+    """For each candidate guess, how the remaining words split by feedback pattern.
+
+    sizes[j, p] is how many remaining words would give pattern p for candidate j, left[j, p] how
+    many words would be left after that feedback and mass[j, p] the total weight (commonality)
+    of the words giving it."""
+
+    def __init__(self, candidates, sizes, left, mass):
+        self.candidates = list(candidates)
+        self.sizes = sizes
+        self.left = left
+        self.mass = mass
+        self.position = {x: j for j, x in enumerate(self.candidates)}
+
+    @classmethod
+    def from_codes(cls, candidates, codes, weights, left=None, length=WORD_LENGTH):
+        """Partitions from a (candidates, answers) pattern code matrix for words of length
+        letters. Without left, the words left are the bucket sizes themselves, with nothing left
+        after guessing the answer."""
+        sizes = pattern_histograms(codes, length)
+        n_patterns = sizes.shape[1]
+        offsets = codes.astype(np.int64) + n_patterns * np.arange(len(codes))[:, None]
+        mass = np.bincount(
+            offsets.ravel(),
+            weights=np.broadcast_to(weights, codes.shape).ravel(),
+            minlength=sizes.size,
+        ).reshape(sizes.shape)
+        if left is None:
+            left = sizes.copy()
+            # the all green code is the last one
+            left[:, -1] = 0
+        return cls(candidates, sizes, left, mass)
+
+    @classmethod
+    def concat(cls, parts, n_patterns):
+        if not parts:
+            empty = np.zeros((0, n_patterns), dtype=np.int64)
+            return cls([], empty, empty, empty.astype(float))
+        return cls(
+            [x for part in parts for x in part.candidates],
+            np.vstack([x.sizes for x in parts]),
+            np.vstack([x.left for x in parts]),
+            np.vstack([x.mass for x in parts]),
+        )
+
+    def __len__(self):
+        return len(self.candidates)
+
+    def take(self, rows):
+        return Partitions(
+            [self.candidates[j] for j in rows], self.sizes[rows], self.left[rows], self.mass[rows]
+        )
+
+    @property
+    def n_answers(self):
+        return int(self.sizes[0].sum()) if len(self) else 0
+
+    def total(self):
+        """sum over hypothetical answers of the words left, mean times n_answers"""
+        return (self.sizes * self.left).sum(axis=1)
+
+    def spread(self):
+        """n * sum(x**2) - sum(x)**2, exact and ordered like the standard deviation"""
+        total = self.total()
+        return self.n_answers * (self.sizes * self.left**2).sum(axis=1) - total**2
+
+    def mean(self):
+        return self.total() / max(self.n_answers, 1)
+
+    def std(self):
+        n = self.n_answers
+        if n < 2:
+            return np.full(len(self), np.nan)
+        return np.sqrt(np.maximum(self.spread(), 0) / (n * (n - 1)))
+
+    def max(self):
+        return np.where(self.sizes > 0, self.left, 0).max(axis=1)
+
+    def entropy(self):
+        """bits of information in the feedback, with every remaining word equally likely"""
+        p = self.sizes / max(self.n_answers, 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return -np.where(p > 0, p * np.log2(p), 0).sum(axis=1)
+
+    def weighted_mean(self):
+        """expected words left with the answer drawn in proportion to commonality"""
+        mass = self.mass.sum(axis=1)
+        return (self.mass * self.left).sum(axis=1) / np.where(mass > 0, mass, 1)
+
+
+class Strategy:
+    """Ranks candidates by a tuple of keys, smallest first and most important key first.
+    Ties left after every key keep the heuristic order the candidates came in."""
+
+    name = None
+
+    def keys(self, partitions, tiebreak):
+        raise NotImplementedError
+
+    def stats(self, partitions):
+        """readable statistics for logging"""
+        return {
+            'mean': partitions.mean(),
+            'std': partitions.std(),
+            'max': partitions.max(),
+        }
+
+    def rank(self, partitions, tiebreak):
+        """candidate positions in order, best first"""
+        keys = self.keys(partitions, tiebreak)
+        return np.lexsort(keys[::-1])
+
+
+class MeanStrategy(Strategy):
+    """fewest words left on average, the original Wordle rule"""
+
+    name = 'mean'
+
+    def keys(self, partitions, tiebreak):
+        return [
+            partitions.total(),
+            partitions.spread(),
+            partitions.max(),
+            -tiebreak['commonality'],
+            -tiebreak['local_coverage'],
+            -tiebreak['local_placement'],
+        ]
+
+
+class MinimaxStrategy(Strategy):
+    """fewest words left in the worst case, as WordNetMinMix does"""
+
+    name = 'minimax'
+
+    def keys(self, partitions, tiebreak):
+        return [
+            partitions.max(),
+            partitions.spread(),
+            partitions.total(),
+            -tiebreak['local_coverage'],
+            -tiebreak['local_placement'],
+        ]
+
+
+class EntropyStrategy(Strategy):
+    """most information from the feedback"""
+
+    name = 'entropy'
+
+    def keys(self, partitions, tiebreak):
+        return [
+            -np.round(partitions.entropy(), 12),
+            partitions.total(),
+            partitions.max(),
+            -tiebreak['commonality'],
+        ]
+
+    def stats(self, partitions):
+        return {**super().stats(partitions), 'entropy': partitions.entropy()}
+
+
+class WeightedMeanStrategy(Strategy):
+    """fewest words left on average, weighting likely (common) answers more"""
+
+    name = 'weighted'
+
+    def keys(self, partitions, tiebreak):
+        return [
+            np.round(partitions.weighted_mean(), 9),
+            partitions.total(),
+            partitions.max(),
+            -tiebreak['commonality'],
+        ]
+
+    def stats(self, partitions):
+        return {**super().stats(partitions), 'weighted_mean': partitions.weighted_mean()}
+
+
+STRATEGIES = {
+    x.name: x() for x in (MeanStrategy, MinimaxStrategy, EntropyStrategy, WeightedMeanStrategy)
+}
+
+
+def get_strategy(strategy):
+    """a Strategy instance from its name, or the strategy itself"""
+    if isinstance(strategy, str):
+        return STRATEGIES[strategy]
+    return strategy
@@ -1,11 +1,112 @@
 from wordle import WordNetWordle2
 import argparse
-import requests
+import asyncio
 import datetime
-import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from config import initial_guess
-import json
-from mastodon import Mastodon
+from bot_clients import MastodonClient, NYTPuzzleClient, StubPostClient, StubPuzzleClient
+from history import History
+
+_solver = None
+
+
+def _init_solver(solver_kwargs, policy):
+    """build the solver once for the process (or thread) that plays the puzzles"""
+    global _solver
+    _solver = WordNetWordle2(**solver_kwargs)
+    if policy:
+        _solver.load_policy(policy)
+
+
+def solve(puzzle):
+    """play the puzzle with the loaded solver and return its history entry"""
+    w = _solver
+    target_word, wordle_num = puzzle['solution'], puzzle['wordle_num']
+    try:
+        score, word, text, luck, word_list = w.play_game(
+            target_word, wordle_num, force_init_guess=initial_guess
+        )
+    except AssertionError:
+        # not one of the target words, so allow every dictionary word for this puzzle only
+        target_words = w.target_words
+        w.target_words = w.short_words
+        try:
+            score, word, text, luck, word_list = w.play_game(
+                target_word, wordle_num, force_init_guess=initial_guess
+            )
+        finally:
+            w.target_words = target_words
+    return {
+        'wordle_num': wordle_num,
+        'date': puzzle.get('date'),
+        'masto_id': None,
+        'score': score,
+        'word': word,
+        'text': text,
+        'luck': luck,
+        'word_list': word_list,
+    }
+
+
+def date_range(start, end):
+    start = datetime.date.fromisoformat(start)
+    end = datetime.date.fromisoformat(end)
+    return [str(start + datetime.timedelta(days=i)) for i in range((end - start).days + 1)]
+
+
+async def fetch_puzzles(puzzle_client, dates, concurrency=8):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def fetch(date):
+        async with limit:
+            return await puzzle_client.fetch(date)
+
+    return await asyncio.gather(*(fetch(x) for x in dates))
+
+
+async def run(
+    puzzles,
+    history,
+    puzzle_client=None,
+    post_client=None,
+    solver_kwargs=None,
+    policy=None,
+    workers=1,
+    concurrency=8,
+):
+    """Solve every puzzle not yet in history, recording each as it's solved, then post the ones
+    not posted yet in puzzle order if there's a post_client. puzzles are dicts with 'wordle_num'
+    and 'solution', or dates fetched with puzzle_client, concurrency at a time. All the puzzles
+    are played by one solver loaded up front, or one per process with workers > 1."""
+    dates = [x for x in puzzles if isinstance(x, str)]
+    if dates:
+        fetched = await fetch_puzzles(puzzle_client, dates, concurrency)
+        puzzles = [x for x in puzzles if not isinstance(x, str)] + fetched
+    todo = [x for x in puzzles if not history.solved(x['wordle_num'])]
+    if todo:
+        # the solver isn't thread safe, so in process the games are played one at a time
+        executor = (
+            ProcessPoolExecutor(workers, initializer=_init_solver, initargs=(solver_kwargs, policy))
+            if workers > 1
+            else ThreadPoolExecutor(1, initializer=_init_solver, initargs=(solver_kwargs, policy))
+        )
+        with executor:
+            futures = [executor.submit(solve, x) for x in todo]
+            for future in asyncio.as_completed([asyncio.wrap_future(x) for x in futures]):
+                entry = await future
+                history.append(entry)
+                print(f"solved wordle {entry['wordle_num']} in {entry['score']}")
+
+    if post_client is None:
+        return
+    for num in sorted({x['wordle_num'] for x in puzzles}):
+        if history.posted(num):
+            print(f'wordle {num} has been tooted')
+            continue
+        text = history.get(num)['text'] + '\n#Wordle'
+        mastodon_id = await post_client.post(text, spoiler_text=f'Wordle {num}')
+        history.append({'wordle_num': num, 'masto_id': mastodon_id, 'text': text})
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Wordle')
@@ -17,74 +118,68 @@ if __name__ == '__main__':
     parser.add_argument('--no-mast', action='store_true', help='no mastodon', default=False)
 
     parser.add_argument('--date', type=str, help='run for this date', default=None)
+    parser.add_argument(
+        '--from', dest='from_date', type=str, help='backfill from this date', default=None
+    )
+    parser.add_argument(
+        '--to', dest='to_date', type=str, help='backfill up to this date (or today)', default=None
+    )
+    parser.add_argument('--workers', type=int, help='puzzles solved at once', default=1)
+    parser.add_argument(
+        '--policy', type=str, help='precomputed policy file from policy.py', default=None
+    )
+    parser.add_argument(
+        '--history', type=str, help='history file', default='better_history.jsonl'
+    )
+    parser.add_argument(
+        '--puzzle-file',
+        type=str,
+        help='JSON of date -> puzzle to use instead of fetching from the NYT',
+        default=None,
+    )
+    parser.add_argument(
+        '--stub-post', action='store_true', help='record posts without sending them', default=False
+    )
     args = parser.parse_args()
-    log_file = f'wordle_{args.wordle_num}.txt'
-
-    # logging.basicConfig(format='%(asctime)s %(message)s',
-    #                     datefmt='%m/%d/%Y %I:%M:%S %p',
-    #                     filename=log_file,
-    #                     level='DEBUG')
+    today = datetime.datetime.now().strftime('%Y-%m-%d')
 
-    try:
-        with open('better_history.json') as f:
-            history = json.load(f)
-    except:
-        history = []
-    if not (args.target_word and args.wordle_num):
-        if not args.date:
-            date = datetime.datetime.now().strftime('%Y-%m-%d')
-        else:
-            date = args.date
-        url = f'https://www.nytimes.com/svc/wordle/v2/{date}.json'
-        print(f'Retrieving {url}')
-        data = requests.get(url).json()
-        wordle_num = data['days_since_launch']
-        target_word = data['solution']
+    if args.from_date:
+        puzzles = date_range(args.from_date, args.to_date or today)
+        # one solver for the whole range, so no per puzzle log file
+        solver_kwargs = {'log_level': 'WARNING'}
+    elif args.target_word and args.wordle_num:
+        puzzles = [{'wordle_num': args.wordle_num, 'solution': args.target_word}]
+        solver_kwargs = {'log_file': f'wordle_{args.wordle_num}.txt'}
     else:
-        target_word = args.target_word
-        wordle_num = args.wordle_num
+        puzzles = [args.date or today]
+        solver_kwargs = {'log_file': f'wordle_{args.wordle_num}.txt'}
 
-    w = WordNetWordle2(log_file=log_file)
-    try:
-        score, word, text, luck, word_list = w.play_game(
-            target_word, wordle_num, force_init_guess=initial_guess
-        )
-    except AssertionError:
-        w.target_words = w.short_words
-        score, word, text, luck, word_list = w.play_game(
-            target_word, wordle_num, force_init_guess=initial_guess
-        )
-
-        pass
-    print('solved')
-    w.logger.setLevel(logging.CRITICAL)
-    entry = [x for x in history if x['wordle_num'] == wordle_num]
-    if entry:
-        entry = entry[0]
+    if args.puzzle_file:
+        puzzle_client = StubPuzzleClient.from_file(args.puzzle_file)
+    elif any(isinstance(x, str) for x in puzzles):
+        puzzle_client = NYTPuzzleClient()
     else:
-        entry = {}
-    if not args.no_mast:
-        assert entry.get('mast_id') is None, f'wordle {wordle_num} has been tooted'
-
-        text = text + '\n#Wordle'
-        mastodon = Mastodon(access_token='mastodon.secret', api_base_url='https://vmst.io')
-        response = mastodon.status_post(status=text, spoiler_text=f'Wordle {wordle_num}')
-        mastodon_id = response['id']
+        puzzle_client = None
+    if args.no_mast:
+        post_client = None
+    elif args.stub_post:
+        post_client = StubPostClient()
     else:
-        mastodon_id = None
-
-    history.append(
-        {
-            'wordle_num': wordle_num,
-            'masto_id': mastodon_id,
-            'score': score,
-            'word': word,
-            'text': text,
-            'luck': luck,
-            'word_list': word_list,
-        }
+        post_client = MastodonClient(access_token='mastodon.secret', api_base_url='https://vmst.io')
+
+    asyncio.run(
+        run(
+            puzzles,
+            History(args.history),
+            puzzle_client,
+            post_client,
+            solver_kwargs=solver_kwargs,
+            policy=args.policy,
+            workers=args.workers,
+        )
     )
-    with open('better_history.json', 'w') as f:
-        json.dump(history, f, indent=4)
+    if args.stub_post:
+        for post in post_client.posts:
+            print(f"{post['spoiler_text']}\n{post['text']}\n")
 
     ## need to make code to check date and tweet log reply to yesterday as well as upload the log?
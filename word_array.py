@@ -0,0 +1,290 @@
+"""Word lists encoded as NumPy arrays so the known constraints can be checked against every word at once.
+
+Each word is a row of letter indices plus a bitmask per count level: bit b of count_masks[:, k]
+is set when the word has more than k of letter b, so count_masks[:, 0] is the letter presence
+mask and count_masks[:, 1] marks the doubled letters. Checking a constraint is then a few
+integer operations on a column. The masks are 32 bits wide, or 64 for alphabets of more than 32
+letters, and there is a count level per letter of the word length.
+"""
+import numpy as np
+
+from patterns import ALPHABET, WORD_LENGTH, encode_words
+
+MAX_ALPHABET = 64
+
+
+def mask_dtype(alphabet):
+    if len(alphabet) > MAX_ALPHABET:
+        raise ValueError(f'alphabets of up to {MAX_ALPHABET} letters are supported')
+    return np.uint32 if len(alphabet) <= 32 else np.uint64
+
+
+def letter_bits(letters, letter_index, dtype=np.uint32):
+    """bitmask of the letters that are in the alphabet"""
+    bits = 0
+    for letter in letters:
+        if letter in letter_index:
+            bits |= 1 << letter_index[letter]
+    return dtype(bits)
+
+
+def bits_letters(bits, alphabet):
+    """the letters of alphabet whose bits are set, the inverse of letter_bits"""
+    return [letter for i, letter in enumerate(alphabet) if bits >> i & 1]
+
+
+class GameState:
+    """What the feedback so far says about the answer. possible_bits is the letter_bits mask of
+    the letters the answer can still have, None meaning any letter."""
+
+    __slots__ = (
+        'partial_solution',
+        'bad_position_dict',
+        'good_letters',
+        'no_double_letters',
+        'possible_bits',
+    )
+
+    def __init__(
+        self,
+        partial_solution=None,
+        bad_position_dict=None,
+        good_letters=None,
+        no_double_letters=None,
+        possible_bits=None,
+    ):
+        self.partial_solution = {} if partial_solution is None else partial_solution
+        self.bad_position_dict = [] if bad_position_dict is None else bad_position_dict
+        self.good_letters = {} if good_letters is None else good_letters
+        self.no_double_letters = {} if no_double_letters is None else no_double_letters
+        self.possible_bits = possible_bits
+
+    def __repr__(self):
+        fields = ', '.join(f'{key}={getattr(self, key)!r}' for key in self.__slots__)
+        return f'GameState({fields})'
+
+
+class WordCodes:
+    """letter indices and count masks for a fixed word list, computed once and sliced from then on"""
+
+    def __init__(self, words, alphabet=ALPHABET):
+        dtype = mask_dtype(alphabet)
+        self.words = list(words)
+        self.alphabet = alphabet
+        self.index = {}
+        for i, x in enumerate(self.words):
+            self.index.setdefault(x, i)
+        letters = encode_words(self.words, alphabet)
+        n_words, length = letters.shape
+        # any character outside the alphabet can never be a possible letter
+        self.valid = (letters < len(alphabet)).all(axis=1)
+        self.letters = np.minimum(letters, len(alphabet))
+        counts = np.zeros((n_words, len(alphabet) + 1), dtype=np.uint8)
+        rows = np.arange(n_words)
+        for i in range(length):
+            counts[rows, self.letters[:, i]] += 1
+        bits = dtype(1) << np.arange(len(alphabet), dtype=dtype)
+        self.count_masks = np.zeros((n_words, length), dtype=dtype)
+        for k in range(length):
+            self.count_masks[:, k] = (counts[:, :-1] > k).astype(dtype) @ bits
+
+    def rows(self, words):
+        """positions of words in the list, or None if any of them isn't in it"""
+        rows = [self.index.get(x) for x in words]
+        return None if None in rows else rows
+
+
+class WordArray:
+    """letter indices and count masks for a list of words, taken from codes when it covers them"""
+
+    def __init__(self, words, alphabet=ALPHABET, codes=None):
+        self.words = list(words)
+        self.alphabet = alphabet
+        self.letter_index = {letter: i for i, letter in enumerate(alphabet)}
+        rows = codes.rows(self.words) if codes is not None else None
+        if rows is None:
+            codes, rows = WordCodes(self.words, alphabet), slice(None)
+        self.codes = codes
+        self.rows = rows
+        self.letters = codes.letters[rows]
+        self.valid = codes.valid[rows]
+        self.count_masks = codes.count_masks[rows]
+        self._positions = None
+
+    def __len__(self):
+        return len(self.words)
+
+    def positions_of(self, word):
+        if self._positions is None:
+            self._positions = {}
+            for i, x in enumerate(self.words):
+                self._positions.setdefault(x, []).append(i)
+        return self._positions.get(word, [])
+
+    def matches(self, state):
+        """Boolean mask of the words that satisfy every constraint in state (a GameState).
+        Equivalent to `Wordle.match_solution`, `check_possible_word`, `check_bad_positions` and
+        `check_no_double_letters` all passing."""
+        mask = self.valid.copy()
+        for position, letter in state.partial_solution.items():
+            mask &= self.letters[:, position] == self.letter_index[letter]
+        for letter, position in state.bad_position_dict:
+            mask &= self.letters[:, position] != self.letter_index[letter]
+        # at least count of a letter is its bit at count level count - 1
+        required = {}
+        for letter, count in state.good_letters.items():
+            if count > self.count_masks.shape[1]:
+                return np.zeros(len(self), dtype=bool)
+            if count > 0:
+                bit = 1 << self.letter_index[letter]
+                required[count - 1] = required.get(count - 1, 0) | bit
+        dtype = self.count_masks.dtype.type
+        for level, bits in required.items():
+            bits = dtype(bits)
+            mask &= (self.count_masks[:, level] & bits) == bits
+        if state.possible_bits is not None:
+            excluded = dtype(((1 << len(self.alphabet)) - 1) & ~state.possible_bits)
+            if excluded:
+                mask &= (self.count_masks[:, 0] & excluded) == 0
+        no_double = letter_bits(state.no_double_letters, self.letter_index, dtype)
+        if no_double and self.count_masks.shape[1] > 1:
+            mask &= (self.count_masks[:, 1] & no_double) == 0
+        return mask
+
+    def filter(self, state, exclude=()):
+        """Indices of the words that satisfy every constraint in state, in list order, leaving
+        out the words in exclude."""
+        mask = self.matches(state)
+        for word in exclude:
+            mask[self.positions_of(word)] = False
+        return np.flatnonzero(mask)
+
+
+class LegalGuesses:
+    """Hard mode: which words of a WordCodes can still be guessed, i.e. have every green letter in
+    place and at least as many of each letter as found so far. Constraints only ever get added
+    during a game, so each update only applies the new ones to the mask, starting over if the
+    state isn't a continuation of the last one (a new game, or a state restored from a snapshot)."""
+
+    def __init__(self, codes):
+        self.codes = codes
+        self.letter_index = {letter: i for i, letter in enumerate(codes.alphabet)}
+        self.reset()
+
+    def reset(self):
+        self.mask = self.codes.valid.copy()
+        self.greens = {}
+        self.min_counts = {}
+
+    def update(self, state):
+        """narrow the mask to the greens and letter counts in state (a GameState)"""
+        greens, min_counts = state.partial_solution, state.good_letters
+        if any(greens.get(k) != v for k, v in self.greens.items()) or any(
+            min_counts.get(k, 0) < v for k, v in self.min_counts.items()
+        ):
+            self.reset()
+        for position, letter in greens.items():
+            if position not in self.greens:
+                self.mask &= self.codes.letters[:, position] == self.letter_index[letter]
+                self.greens[position] = letter
+        levels = self.codes.count_masks.shape[1]
+        for letter, count in min_counts.items():
+            if count > self.min_counts.get(letter, 0):
+                if count > levels:
+                    self.mask[:] = False
+                else:
+                    bit = self.codes.count_masks.dtype.type(1 << self.letter_index[letter])
+                    self.mask &= (self.codes.count_masks[:, count - 1] & bit) != 0
+                self.min_counts[letter] = count
+        return self
+
+    def __len__(self):
+        return int(self.mask.sum())
+
+    def allowed(self, word_array):
+        """boolean mask of the words in word_array that are legal guesses"""
+        if word_array.codes is self.codes:
+            return self.mask[word_array.rows]
+        return word_array.matches(
+            GameState(partial_solution=self.greens, good_letters=self.min_counts)
+        )
+
+    def is_legal(self, word):
+        row = self.codes.index.get(word)
+        if row is not None:
+            return bool(self.mask[row])
+        return all(word[k] == v for k, v in self.greens.items()) and all(
+            word.count(k) >= v for k, v in self.min_counts.items()
+        )
+
+
+class LetterCounts:
+    """How many words have each letter at each position, and how many contain each letter, over a
+    word list. The list can be swapped for a subset of itself (remaining_words shrinking during a
+    game) by taking the words that are gone back out rather than counting everything again."""
+
+    def __init__(self, words, alphabet=ALPHABET, length=WORD_LENGTH):
+        self.alphabet = alphabet
+        self.length = length
+        self.letter_index = {letter: i for i, letter in enumerate(alphabet)}
+        self.set_words(words)
+
+    @classmethod
+    def from_tables(cls, score_dict, placement_counter, alphabet=ALPHABET, length=WORD_LENGTH):
+        """the counts in the score_dict and placement_counter dictionaries a solver keeps for its
+        target words"""
+        counts = cls([], alphabet, length)
+        for letter, val in score_dict.items():
+            if letter in counts.letter_index:
+                counts.presence[counts.letter_index[letter]] = val
+        for i, counter in placement_counter.items():
+            for letter, val in counter.items():
+                if letter in counts.letter_index:
+                    counts.position[int(i), counts.letter_index[letter]] = val
+        return counts
+
+    def encode(self, words):
+        """letter indices of words, anything outside the alphabet sharing the last column"""
+        return np.minimum(encode_words(list(words), self.alphabet), len(self.alphabet))
+
+    def set_words(self, words):
+        self.words = list(words)
+        self.letters = self.encode(self.words)
+        self.position = np.zeros((self.length, len(self.alphabet) + 1), dtype=np.int64)
+        self.presence = np.zeros(len(self.alphabet) + 1, dtype=np.int64)
+        self.count(self.letters, 1)
+
+    def count(self, letters, sign):
+        if not len(letters):
+            return
+        np.add.at(self.position, (np.arange(letters.shape[1]), letters), sign)
+        present = np.zeros((len(letters), len(self.alphabet) + 1), dtype=bool)
+        present[np.arange(len(letters))[:, None], letters] = True
+        present[:, -1] = False
+        self.presence += sign * present.sum(axis=0)
+
+    def update(self, words):
+        """counts for words, taking out the words no longer there if words is a subset of the
+        current list in the same order, counting from scratch otherwise"""
+        if words == self.words:
+            return self
+        keep = set(words)
+        rows = [i for i, x in enumerate(self.words) if x in keep]
+        gone = np.setdiff1d(np.arange(len(self.words)), rows)
+        if len(gone) > len(rows) or [self.words[i] for i in rows] != list(words):
+            self.set_words(words)
+            return self
+        self.count(self.letters[gone], -1)
+        self.words = list(words)
+        self.letters = self.letters[rows]
+        return self
+
+    def placement_scores(self, letters):
+        """for each row of encoded letters, how many of the words share a letter in each position"""
+        return self.position[np.arange(letters.shape[1]), letters].sum(axis=1)
+
+    def coverage_scores(self, letters):
+        """for each row of encoded letters, how many of the words contain each of its distinct letters"""
+        present = np.zeros((len(letters), len(self.alphabet) + 1), dtype=bool)
+        present[np.arange(len(letters))[:, None], letters] = True
+        return present.astype(np.int64) @ self.presence
@@ -1,15 +1,44 @@
 from nltk import WordNetLemmatizer
 
-import re
-from functools import partial
 from nltk.corpus import gutenberg, brown, wordnet, words
 from collections import Counter
+import numpy as np
 import pandas as pd
 from exclusions import EXCLUSION_SET
+import itertools
 import logging
-from copy import deepcopy
-from concurrent.futures import ProcessPoolExecutor
-from tqdm.notebook import tqdm
+import os
+import time
+from copy import copy, deepcopy
+from patterns import (
+    PatternMatrix,
+    CACHE_DIR,
+    ALPHABET,
+    WORD_LENGTH,
+    get_spec,
+    line_to_code,
+)
+from word_array import (
+    GameState,
+    LegalGuesses,
+    LetterCounts,
+    WordArray,
+    WordCodes,
+    bits_letters,
+    letter_bits,
+)
+from pool import SolverPool, fingerprint
+from artifacts import load_artifact, save_artifact
+from frequency import FrequencyIndex, FREQUENCY_FILE
+from policy import Policy, play_feedback, snapshot, split_answers
+from decision_cache import decision_key
+from strategies import Partitions, get_strategy
+from optimal import OptimalSearch
+
+# handlers on the module logger, by log file path (None for the console)
+_log_handlers = {}
+# ids telling pool workers a new round of WordNetWordle3 rollouts has started
+_rollout_rounds = itertools.count()
 
 
 def flatten_list(list_of_lists):
@@ -20,13 +49,60 @@ def get_sub_string(x, indices):
     return ''.join(x[i] for i in indices)
 
 
+def state_attribute(name):
+    """a solver attribute that lives on its GameState"""
+    return property(
+        lambda self: getattr(self.game_state, name, None),
+        lambda self, val: setattr(self.game_state, name, val),
+    )
+
+
 class Wordle:
     max_workers = 10
-    good_letters = None
+    game_state = None
+    partial_solution = state_attribute('partial_solution')
+    bad_position_dict = state_attribute('bad_position_dict')
+    good_letters = state_attribute('good_letters')
+    no_double_letters = state_attribute('no_double_letters')
+    possible_bits = state_attribute('possible_bits')
     target_words = None
     top_guess_count = 25
     hard_mode = False
     commonality = None
+    pattern_matrix = None
+    word_array = None
+    word_codes = None
+    letter_counts = None
+    frequency_counts = None
+    guess_array = None
+    legal_guesses = None
+    pool = None
+    policy = None
+    decision_cache = None
+    # anything else the decisions depend on, e.g. settings compare.py sets on the solver, so
+    # they get their own decision_cache keys
+    decision_scope = ''
+    # a metrics.Metrics to record per round timings and counts to, off by default
+    metrics = None
+    # a game_trace.TraceRecorder to record each round's decision to, off by default
+    trace = None
+    cache_dir = CACHE_DIR
+    # the letters words are made of and how many, see spec
+    alphabet = ALPHABET
+    word_length = WORD_LENGTH
+    # 'partition' buckets the remaining words by feedback pattern, 'replay' plays every
+    # (hypothetical answer, candidate) pair through its own CounterFactual and 'exhaustive'
+    # scores every allowed guess instead of the top_guess_count shortlist from bucket sizes alone
+    counter_factual_mode = 'partition'
+    counter_factual_batch_size = 512
+    counter_factual_time_budget = None
+    # how candidates are ranked from the way they split the remaining words, a name in
+    # strategies.STRATEGIES ('mean', 'minimax', 'entropy', 'weighted') or a Strategy
+    strategy = 'mean'
+    # load the word lists and frequency tables from .wordle_cache when the class, its
+    # parameters and the source_files below haven't changed
+    use_artifacts = True
+    source_files = (FREQUENCY_FILE,)
 
     def __init__(self, log_level='DEBUG', backtest=False, log_file=None, hard_mode=False):
         self.hard_mode = hard_mode
@@ -35,76 +111,117 @@ class Wordle:
         self.log_file = log_file
         self.init_logging()
         self.image_mapping_dict = {1: '🟨', 0: '⬜', 2: '🟩'}
-        self.make_word_list()
-        self.make_frequency_series()
-        self.make_commonality_lookup()
+        if self.use_artifacts and load_artifact(self, self.cache_dir):
+            self.make_letter_rank_df()
+            self.logger.debug('Loaded word lists from cached artifact')
+        else:
+            self.make_word_list()
+            self.make_frequency_series()
+            self.make_commonality_lookup()
+            if self.use_artifacts:
+                save_artifact(self, self.cache_dir)
         self.logger.debug(
-            f'Wordle inited with {len(self.target_words)} target words and {len(self.short_words)} dictionary words'
+            'Wordle inited with %s target words and %s dictionary words',
+            len(self.target_words),
+            len(self.short_words),
         )
 
+    def artifact_params(self):
+        """constructor arguments that change the word lists, part of the cached artifact key"""
+        return {'backtest': self.backtest}
+
+    @property
+    def spec(self):
+        """the patterns.GameSpec of the alphabet and word length"""
+        return get_spec(self.alphabet, self.word_length)
+
+    @property
+    def possible_letters(self):
+        """the letters possible_bits allows, as a list for the checks that go letter by letter"""
+        if self.possible_bits is None:
+            return None
+        return bits_letters(self.possible_bits, self.alphabet)
+
     def make_commonality_lookup(self):
-        df = pd.read_csv('unigram_freq.csv')
         # Establish a minimum frequency for any Wordle word that's missing from the frequency dataset
         min_freq = 0
-        english_freqs = {df['word'][i]: df['count'][i] for i in df.index}
-        self.commonality = {
-            w: min_freq if w not in english_freqs else english_freqs[w]
-            for w in self.target_words
-        }
-
-    def make_word_list(self):
-        short_words_guttenburg = list(
-            {
-                word
-                for word in gutenberg.words()
-                if len(word) == 5 and word.lower() == word and re.match(r'[a-zA-Z]{5}', word)
-            }
+        index = FrequencyIndex.load(
+            FREQUENCY_FILE, length=self.word_length, cache_dir=self.cache_dir
+        )
+        self.commonality = dict(
+            zip(self.target_words, index.lookup(self.target_words, default=min_freq))
         )
 
-        short_words_brown = list(
-            {
-                word
-                for word in brown.words()
-                if len(word) == 5 and word.lower() == word and re.match(r'[a-zA-Z]{5}', word)
-            }
+    def is_word(self, word):
+        """whether a word from a corpus belongs in the word list"""
+        return (
+            len(word) == self.word_length
+            and word.lower() == word
+            and all(x in self.alphabet for x in word)
         )
+
+    def make_word_list(self):
+        short_words_guttenburg = list({word for word in gutenberg.words() if self.is_word(word)})
+
+        short_words_brown = list({word for word in brown.words() if self.is_word(word)})
         short_words = list(set(short_words_brown + short_words_guttenburg))
         self.short_words = list(set(short_words).difference(EXCLUSION_SET))
 
     def init_logging(self):
         self.logger = logging.getLogger(__name__)
-        self.log_level = self.log_level
         self.logger.setLevel(self.log_level)
-        ch = logging.StreamHandler()
-        ch.setLevel(self.log_level)
-
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        ch.setFormatter(formatter)
-        self.logger.addHandler(ch)
-
-        # add the file handler handlers to the logger
+        # the logger is shared by every solver, so its handlers are added the first time only
+        # and just get the new level after that, instead of every record being written once per
+        # solver constructed so far
+        targets = [None]
         if self.log_file:
-            fh = logging.FileHandler(self.log_file)
-            fh.setLevel(self.log_level)
-            fh.setFormatter(formatter)
-
-            self.logger.addHandler(fh)
+            targets.append(os.path.abspath(self.log_file))
+        for target in targets:
+            handler = _log_handlers.get(target)
+            if handler is None:
+                handler = logging.StreamHandler() if target is None else logging.FileHandler(target)
+                handler.setFormatter(
+                    logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+                )
+                self.logger.addHandler(handler)
+                _log_handlers[target] = handler
+            handler.setLevel(self.log_level)
 
         #  @lru_cache()
 
     def local_placement_score(self, word, possible_words):
-        placement_counter = {
-            i: dict(Counter([word[i] for word in possible_words])) for i in range(5)
-        }
-        return sum([placement_counter[i].get(letter, 0) for i, letter in enumerate(word)])
+        counts = self.get_letter_counts(possible_words)
+        return int(counts.placement_scores(counts.encode([word]))[0])
+
+    def get_letter_counts(self, possible_words):
+        """per position letter counts over possible_words (remaining_words as the game goes on),
+        updated rather than counted again as the list shrinks"""
+        if self.letter_counts is None or self.letter_counts.alphabet != self.alphabet:
+            self.letter_counts = LetterCounts(possible_words, self.alphabet, self.word_length)
+        return self.letter_counts.update(possible_words)
+
+    def get_frequency_counts(self):
+        """score_dict and placement_counter as arrays, for coverage_guess and placement_score
+        on many words at once"""
+        if self.frequency_counts is None:
+            self.frequency_counts = LetterCounts.from_tables(
+                self.score_dict, self.placement_counter, self.alphabet, self.word_length
+            )
+        return self.frequency_counts
 
     def placement_score(self, word):
         return sum([self.placement_counter[i].get(letter, 0) for i, letter in enumerate(word)])
 
+    def make_letter_rank_df(self):
+        letter_rank_series = pd.Series(self.score_dict).sort_values(ascending=False)
+        self.letter_rank_df = pd.DataFrame(
+            letter_rank_series, columns=['frequency']
+        ).reset_index()
+
     def make_frequency_series(self):
-        lemma = WordNetLemmatizer()
         # no plurals in the ~200 wordles so far, this is the simplest way to get rid of plurals
         if self.target_words is None:
+            lemma = WordNetLemmatizer()
             self.target_words = [
                 word
                 for word in self.short_words
@@ -112,26 +229,22 @@ class Wordle:
             ]
         self.score_dict = {
             letter: sum([letter in word for word in self.target_words])
-            for letter in 'abcdefghijklmnopqrstuvwxyz'
+            for letter in self.alphabet
         }
-        letter_rank_series = pd.Series(self.score_dict).sort_values(ascending=False)
-        self.letter_rank_df = pd.DataFrame(
-            letter_rank_series, columns=['frequency']
-        ).reset_index()
+        self.make_letter_rank_df()
         self.placement_counter = {
-            i: dict(Counter([word[i] for word in self.target_words])) for i in range(5)
+            i: dict(Counter([word[i] for word in self.target_words]))
+            for i in range(self.word_length)
         }
 
     def make_frequency_series_old(self):
         all_letters = flatten_list([list(x) for x in self.short_words])
         c = Counter(all_letters)
         self.score_dict = dict(c)
-        letter_rank_series = pd.Series(self.score_dict).sort_values(ascending=False)
-        self.letter_rank_df = pd.DataFrame(
-            letter_rank_series, columns=['frequency']
-        ).reset_index()
+        self.make_letter_rank_df()
         self.placement_counter = {
-            i: dict(Counter([word[i] for word in self.short_words])) for i in range(5)
+            i: dict(Counter([word[i] for word in self.short_words]))
+            for i in range(self.word_length)
         }
 
     @staticmethod
@@ -158,12 +271,32 @@ class Wordle:
         non_position_match = find_non_position_match(remaining_letters, guess)
         return [x or y for x, y in zip(match_and_position, non_position_match)]
 
+    def get_pattern_matrix(self):
+        """guess x answer feedback codes for short_words and target_words, built or loaded on first use"""
+        if self.pattern_matrix is None:
+            self.pattern_matrix = PatternMatrix.load(
+                self.short_words, self.target_words, self.cache_dir
+            )
+        return self.pattern_matrix
+
+    def get_line(self, guess, answer):
+        """same as get_num_line but read from the pattern matrix, falling back to get_num_line for
+        words the matrix doesn't cover (e.g. a forced initial guess)"""
+        code = self.get_pattern_matrix().code(guess, answer)
+        if code is None:
+            return self.get_num_line(guess, answer)
+        return list(self.spec.pattern_lines[code])
+
     def score_word(self, guess, answer):
         # print(guess, len(self.short_words))
         if guess == answer:
-            return ['Winner'] * 3 + [[2, 2, 2, 2, 2]]
-        match_and_position = self.get_num_line(guess, answer)
-        assert guess in self.short_words, 'guess not in short words'
+            return ['Winner'] * 3 + [list(self.spec.winning_line)]
+        # a dict lookup in the pattern matrix's guesses, only scanning short_words for words
+        # added after it was built (a forced initial guess)
+        assert (
+            guess in self.get_pattern_matrix().guess_index or guess in self.short_words
+        ), 'guess not in short words'
+        match_and_position = self.get_line(guess, answer)
         good_letters = [x for i, x in enumerate(guess) if match_and_position[i] > 0]
         # self.logger.debug(match_and_position)
         bad_letters = [
@@ -186,12 +319,11 @@ class Wordle:
         force_init_guess=None,
         allow_counter_factual=False,
     ):
-        self.possible_letters = list('abcdefghijklmnopqrstuvwxyz')
+        self.game_state = GameState(
+            possible_bits=letter_bits(self.alphabet, self.spec.letter_index, int)
+        )
         self.answer = answer
-        self.good_letters = {}
-        self.partial_solution = {}
         self.guesses = []
-        self.bad_position_dict = []
         self.success_grid = []
         self.luck_factor = None
         self.luck_factor_flag = 0
@@ -204,7 +336,6 @@ class Wordle:
         self.allow_counter_factual = allow_counter_factual
         self.remaining_words = self.target_words
         self.augmented_guess_count = 0
-        self.no_double_letters = {}
 
     def evaluate_round(self, guess):
         self.guesses.append(guess)
@@ -215,51 +346,169 @@ class Wordle:
         # the luck factor indicates how many equally good options there were at the end
         if self.luck_factor_flag and not self.luck_factor:
             self.luck_factor = self.final_list_length
-        if sum(match_and_position) == 8 and not self.luck_factor:
+        # one letter off
+        if sum(match_and_position) == 2 * (len(guess) - 1) and not self.luck_factor:
             self.luck_factor_flag = 1
 
         self.success_grid.append(match_and_position)
-        self.bad_position_dict.extend(
-            [(x, z) for x, y, z in zip(guess, match_and_position, [0, 1, 2, 3, 4]) if y == 1]
-        )
-        self.bad_position_dict = list(set(self.bad_position_dict))
+        state = self.next_constraints(guess, match_and_position)
+        self.bad_position_dict = state.bad_position_dict
         if bad_letters == 'Winner':
-            self.logger.debug(f'Winner in {len(self.guesses)}: {self.guesses}')
+            self.logger.debug('Winner in %s: %s', len(self.guesses), self.guesses)
             return 'Winner'
-        for letter in bad_letters:
-            if letter in self.possible_letters:
-                self.possible_letters.remove(letter)
         self.logger.debug(
-            f"Good letters New : {good_letters}, old {self.good_letters}' bad letters {bad_letters}"
+            "Good letters New : %s, old %s' bad letters %s",
+            good_letters,
+            self.good_letters,
+            bad_letters,
         )
-        if not self.good_letters:
-            self.good_letters = Counter(good_letters)
-        else:
-            c = Counter(good_letters)
-            for key, val in c.items():
-                if val > self.good_letters[key]:
-                    self.good_letters[key] = val
+        self.game_state = state
+
+        self.logger.debug('partial solution %s', self.partial_solution)
+
+    def apply_feedback(self, guess, match_and_position):
+        """evaluate_round for a game whose answer isn't known, from the score line guess got"""
+        self.guesses.append(guess)
+        self.success_grid.append(list(match_and_position))
+        if all(x == 2 for x in match_and_position):
+            return 'Winner'
+        self.game_state = self.next_constraints(guess, match_and_position)
+
+    def next_constraints(self, guess, match_and_position):
+        """What we'd know after getting this score line for guess, as a new GameState so the
+        current one is left alone"""
+        good_letters = [x for i, x in enumerate(guess) if match_and_position[i] > 0]
+        bad_letters = [
+            x
+            for i, x in enumerate(guess)
+            if match_and_position[i] == 0 and x not in good_letters
+        ]
+        possible_bits = self.possible_bits & ~letter_bits(bad_letters, self.spec.letter_index, int)
 
-        c_guess = Counter(guess)
-        for key, val in c_guess.items():
-            if val > self.good_letters[key]:
-                self.no_double_letters[key] = True
-        for key, val in self.good_letters.items():
-            if val > 1 and key in self.no_double_letters.keys():
-                del self.no_double_letters[key]
+        bad_position_dict = list(
+            set(
+                self.bad_position_dict
+                + [(x, i) for i, (x, y) in enumerate(zip(guess, match_and_position)) if y == 1]
+            )
+        )
 
-        for x, y in position_tuples:
-            self.partial_solution[y] = x
+        known_letters = Counter(self.good_letters)
+        for key, val in Counter(good_letters).items():
+            if val > known_letters[key]:
+                known_letters[key] = val
+
+        no_double_letters = dict(self.no_double_letters)
+        for key, val in Counter(guess).items():
+            if val > known_letters[key]:
+                no_double_letters[key] = True
+        for key, val in known_letters.items():
+            if val > 1 and key in no_double_letters.keys():
+                del no_double_letters[key]
+
+        partial_solution = dict(self.partial_solution)
+        for i, (x, y) in enumerate(zip(guess, match_and_position)):
+            if y == 2:
+                partial_solution[i] = x
+
+        return GameState(
+            partial_solution, bad_position_dict, known_letters, no_double_letters, possible_bits
+        )
 
-        self.logger.debug(f'partial solution {self.partial_solution}')
+    def counter_factual_partition(self, top_guess_candidates):
+        """How the remaining words split for each candidate, with the words left after each
+        feedback counted as the CounterFactual replay in counter_factual_guess would but without
+        building a solver per hypothesis. Survivors are counted once per feedback bucket and
+        every hypothetical answer in a bucket shares that count."""
+        words = self.get_word_array()
+        candidates = sorted(set(top_guess_candidates).difference(self.guesses))
+        codes = self.get_pattern_matrix().submatrix(candidates, words.words)
+        spec = self.spec
+        left = np.zeros((len(candidates), spec.n_patterns), dtype=np.int64)
+        for j, guess in enumerate(candidates):
+            for code in np.unique(codes[j]):
+                if code == spec.winning_code:
+                    continue
+                state = self.next_constraints(guess, spec.pattern_lines[code])
+                left[j, code] = len(words.filter(state, exclude=self.guesses + [guess]))
+        return Partitions.from_codes(
+            candidates, codes, self.answer_weights(words.words), left, spec.length
+        )
+
+    def answer_weights(self, words):
+        """how likely each word is to be the answer, for the commonality weighted strategy"""
+        return np.array([self.commonality.get(x, 0) for x in words], dtype=float) + 1
+
+    def counter_factual_state(self):
+        """a deep copy of the solver state for a CounterFactual, sharing the read only pattern matrix
+        and word array"""
+        not_copied = (
+            'v',
+            'pattern_matrix',
+            'word_array',
+            'word_codes',
+            'legal_guesses',
+            'pool',
+            'policy',
+            'decision_cache',
+            'metrics',
+            'trace',
+            'rollouts',
+        )
+        state = deepcopy(
+            {key: val for key, val in self.__dict__.items() if key not in not_copied}
+        )
+        state['pattern_matrix'] = self.pattern_matrix
+        state['word_array'] = self.word_array
+        state['word_codes'] = self.word_codes
+        state['policy'] = None
+        state['decision_cache'] = None
+        state['metrics'] = None
+        state['trace'] = None
+        return state
+
+    def __getstate__(self):
+        # the pattern matrix reaches worker processes through the pool's shared memory (or the
+        # on disk cache) instead of being pickled, and the pool itself can't be pickled
+        return {
+            key: val for key, val in self.__dict__.items() if key not in ('pattern_matrix', 'pool')
+        }
+
+    def lap(self, name):
+        """count the time since the last lap towards phase name of the round, if recording metrics"""
+        if self.metrics is not None:
+            self.metrics.lap(name)
+
+    def count(self, **values):
+        """add values to the round's metrics and trace records, if recording them"""
+        if self.metrics is not None:
+            self.metrics.count(**values)
+        if self.trace is not None:
+            self.trace.count(**values)
+
+    def get_pool(self):
+        """the solver's worker pool, started on first use and kept across rounds and games.
+        It is restarted only if the word tables it was published with have changed."""
+        if self.pool is None or self.pool.fingerprint != fingerprint(self):
+            self.close()
+            self.pool = SolverPool(self, self.max_workers)
+        return self.pool
+
+    def close(self):
+        """shut down the worker pool and release its shared memory"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def counter_factual_check(self, hypothetical_answer, limited_word_list):
         res = {}
         for word in set(limited_word_list).difference(self.guesses):
-            w = CounterFactual(
-                deepcopy({key: val for key, val in self.__dict__.items() if key != 'v'}),
-                hypothetical_answer,
-            )
+            w = CounterFactual(self.counter_factual_state(), hypothetical_answer)
             out = w.evaluate_round(word)
             if out == 'Winner':
                 res[word] = 0
@@ -267,24 +516,62 @@ class Wordle:
                 res[word] = len(w.make_matching_short_words())
         return res
 
-    def counter_factual_guess(self, top_guess_candidates):
-        out = []
-        # for word, _, _ in self.make_matching_short_words():
-        #    out.append(self.counter_factual_check(word, top_guess_candidates))
-
-        myfunc = partial(self.counter_factual_check, limited_word_list=top_guess_candidates)
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            out = list(
-                tqdm(
-                    executor.map(myfunc, self.remaining_words), total=len(self.remaining_words)
+    def counter_factual_exhaustive(self, top_guess_candidates):
+        """How the remaining words split for each candidate, straight from the sizes of the
+        feedback buckets, batch_size candidates at a time with no per hypothesis work at all.
+        Candidates are taken in the order given (best heuristic score first) and, if
+        counter_factual_time_budget is set, the ones not reached by then are left out. The words
+        left are the exact bucket sizes, which can be slightly smaller than the replayed counts
+        since the known constraints don't capture everything a feedback line says."""
+        start = time.perf_counter()
+        patterns = self.get_pattern_matrix()
+        weights = self.answer_weights(self.remaining_words)
+        candidates = [x for x in dict.fromkeys(top_guess_candidates) if x not in self.guesses]
+        parts = []
+        for j in range(0, len(candidates), self.counter_factual_batch_size):
+            batch = candidates[j : j + self.counter_factual_batch_size]
+            codes = patterns.submatrix(batch, self.remaining_words)
+            parts.append(Partitions.from_codes(batch, codes, weights, length=self.word_length))
+            budget = self.counter_factual_time_budget
+            if budget is not None and time.perf_counter() - start > budget:
+                self.logger.debug(
+                    'time budget reached after %s of %s candidates', j + len(batch), len(candidates)
                 )
-            )
-
-        full_stats = pd.concat([pd.Series(x) for x in out], axis=1).T
+                break
+        return Partitions.concat(parts, self.spec.n_patterns)
 
+    def counter_factual_guess(self, top_guess_candidates):
+        """Partitions of the remaining words for each candidate guess: how many would give
+        each feedback and how many would be left after it, taking every remaining word in turn
+        as the hypothetical answer"""
+        if self.counter_factual_mode == 'exhaustive':
+            return self.counter_factual_exhaustive(top_guess_candidates)
+        if self.counter_factual_mode == 'partition':
+            return self.counter_factual_partition(top_guess_candidates)
+        pool = self.get_pool()
+        out = list(
+            pool.map(
+                self,
+                'counter_factual_check',
+                self.remaining_words,
+                limited_word_list=top_guess_candidates,
+            )
+        )
+        self.count(
+            worker_tasks=pool.last_map['tasks'],
+            worker_utilization=pool.last_map['utilization'],
+        )
         self.logger.setLevel(self.log_level)
-
-        return full_stats
+        candidates = sorted(set(top_guess_candidates).difference(self.guesses))
+        codes = self.get_pattern_matrix().submatrix(candidates, self.remaining_words)
+        # every hypothetical answer giving the same feedback leaves the same words
+        left = np.zeros((len(candidates), self.spec.n_patterns), dtype=np.int64)
+        left[np.arange(len(candidates))[:, None], codes] = pd.DataFrame(
+            out, columns=candidates
+        ).to_numpy(dtype=np.int64).T
+        return Partitions.from_codes(
+            candidates, codes, self.answer_weights(self.remaining_words), left, self.word_length
+        )
 
     def coverage_guess(self, guess):
         return sum([self.score_dict[x] for x in set(guess)])
@@ -302,22 +589,21 @@ class Wordle:
     def check_valid_hard_guess(self, word):
         if self.hard_mode == False:
             return True
-        word_count_dict = dict(Counter(word))
-        return all(
-            word_count_dict.get(key, 0) >= val for key, val in self.good_letters.items()
-        ) and self.match_solution(word)
+        return self.get_legal_guesses().is_legal(word)
 
     def check_possible_word(self, word):
         """ensures the word has the right minimum count of the letters we know are in the word and
         no impossible letters"""
         word_count_dict = dict(Counter(word))
+        possible_letters = self.possible_letters
         return all(
             word_count_dict.get(key, 0) >= val for key, val in self.good_letters.items()
-        ) and all(x in self.possible_letters for x in word)
+        ) and all(x in possible_letters for x in word)
 
     def check_paradox_word(self, word):
         """ensures no known rejected letters are in the guess"""
-        return all(x in self.possible_letters for x in word)
+        possible_letters = self.possible_letters
+        return all(x in possible_letters for x in word)
 
     def score_paradox_word(self, word, letters_it_could_be):
         return sum(x in letters_it_could_be for x in word)
@@ -329,21 +615,55 @@ class Wordle:
         double_letters = [key for key, val in Counter(word).items() if val > 1]
         return all(letter not in self.no_double_letters.keys() for letter in double_letters)
 
+    def get_word_codes(self):
+        """letter indices and count masks for short_words followed by any target_words not in it,
+        encoded once and again only if either list changes"""
+        key = (id(self.short_words), len(self.short_words), id(self.target_words))
+        if self.word_codes is None or self.word_codes[0] != key or (
+            self.word_codes[1].alphabet != self.alphabet
+        ):
+            short_set = set(self.short_words)
+            extra = [x for x in self.target_words if x not in short_set]
+            self.word_codes = (key, WordCodes(self.short_words + extra, self.alphabet))
+        return self.word_codes[1]
+
+    def get_word_array(self):
+        """remaining_words as rows of the word codes, taken again only when the list has changed"""
+        if self.word_array is None or self.word_array.words != self.remaining_words:
+            self.word_array = WordArray(self.remaining_words, self.alphabet, self.get_word_codes())
+        return self.word_array
+
+    def get_guess_array(self):
+        """short_words as rows of the word codes"""
+        codes = self.get_word_codes()
+        if self.guess_array is None or self.guess_array.words != self.short_words:
+            self.guess_array = WordArray(self.short_words, self.alphabet, codes)
+        return self.guess_array
+
+    def get_legal_guesses(self):
+        """the hard mode index of legal guesses, narrowed to the current game state"""
+        codes = self.get_word_codes()
+        if self.legal_guesses is None or self.legal_guesses.codes is not codes:
+            self.legal_guesses = LegalGuesses(codes)
+        return self.legal_guesses.update(self.game_state)
+
+    def matching_indices(self):
+        """indices into remaining_words of the words consistent with everything we know, the
+        vectorized equivalent of match_solution, check_possible_word, check_bad_positions
+        and check_no_double_letters"""
+        return self.get_word_array().filter(self.game_state, exclude=self.guesses)
+
     def make_matching_short_words(self):
+        word_array = self.get_word_array()
+        indices = self.matching_indices()
+        letters = word_array.letters[indices]
+        frequency = self.get_frequency_counts()
+        coverage = frequency.coverage_scores(letters).tolist()
+        placement = frequency.placement_scores(letters).tolist()
         return sorted(
             [
-                (
-                    x,
-                    self.coverage_guess(x),
-                    self.placement_score(x),
-                    self.commonality.get(x, 0),
-                )
-                for x in self.remaining_words
-                if self.match_solution(x)
-                and self.check_possible_word(x)
-                and self.check_bad_positions(x)
-                and self.check_no_double_letters(x)
-                and x not in self.guesses
+                (x, coverage[j], placement[j], self.commonality.get(x, 0))
+                for j, x in enumerate(word_array.words[i] for i in indices)
             ],
             key=lambda x: (-x[3]),
         )  # sorting on total coverage tie breaking with placement score
@@ -351,12 +671,16 @@ class Wordle:
     def generate_guess(self, i=0, augmented_guesses=None):
         """generates a guess based on scoring the dictioray for letter and position coverage"""
         possible_guesses = []
+        exhaustive = self.allow_counter_factual and self.counter_factual_mode == 'exhaustive'
 
         matching_short_words = self.make_matching_short_words()
         self.remaining_words = [x[0] for x in matching_short_words]
+        self.lap('filter')
 
         self.logger.debug(
-            f'there are {len(matching_short_words)} matching target words: {self.remaining_words[:10]}'
+            'there are %s matching target words: %s',
+            len(matching_short_words),
+            self.remaining_words[:10],
         )
         if (
             not self.guess_valid_only
@@ -372,7 +696,7 @@ class Wordle:
             # get the best average time to solution and accept more failures?
 
             indices_we_know = [x[1] for x in self.partial_solution.items()]
-            missing_indices = [x for x in range(5) if x not in indices_we_know]
+            missing_indices = [x for x in range(self.word_length) if x not in indices_we_know]
             letters_it_could_be = set(
                 flatten_list(
                     [get_sub_string(x, missing_indices) for x, y, z, _ in matching_short_words]
@@ -387,92 +711,123 @@ class Wordle:
             # letters_it_could_be = list(
             #    letters_it_could_be.intersection(set(self.possible_letters)))
 
-            self.logger.debug(
-                f'Too many valid solutions. Possible letters {letters_it_could_be}, possible words are {([x[0] for x in matching_short_words])[:10]}...'
-            )
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug(
+                    'Too many valid solutions. Possible letters %s, possible words are %s...',
+                    letters_it_could_be,
+                    self.remaining_words[:10],
+                )
 
             def local_coverage(x):
                 return sum(letter in letters_it_could_be for letter in x)
 
+            # the same two scores and the checks below for every word in short_words at once
+            guess_array = self.get_guess_array()
+            guess_letters = guess_array.letters
+            counts = self.get_letter_counts(self.remaining_words)
+            could_be = np.zeros(len(self.alphabet) + 1, dtype=bool)
+            could_be[
+                [counts.letter_index[x] for x in letters_it_could_be if x in counts.letter_index]
+            ] = True
+            coverage = could_be[guess_letters].sum(axis=1).tolist()
+            placement = counts.placement_scores(guess_letters).tolist()
+            allowed = np.ones(len(guess_array), dtype=bool)
+            if not exhaustive:
+                # check_duplicate_letters
+                allowed &= guess_array.count_masks[:, 1] == 0
+            if self.hard_mode:
+                legal = self.get_legal_guesses()
+                allowed &= legal.allowed(guess_array)
+                self.count(legal_guesses=len(legal))
+
             possible_guesses = sorted(
                 [
-                    (
-                        x,
-                        local_coverage(x),
-                        self.local_placement_score(x, self.remaining_words),
-                        self.commonality.get(x, 0),
-                    )
-                    for x in self.short_words
-                    if self.check_duplicate_letters(x)
-                    and x not in self.guesses
-                    and self.check_valid_hard_guess(x)
+                    (x, coverage[j], placement[j], self.commonality.get(x, 0))
+                    for j, x in enumerate(self.short_words)
+                    if allowed[j] and x not in self.guesses
                 ],
                 key=lambda x: (x[1], x[2]),
                 reverse=True,
             )
 
         elif i == 1:
+            frequency = self.get_frequency_counts()
+            letters = frequency.encode(self.remaining_words)
+            coverage = frequency.coverage_scores(letters).tolist()
+            placement = frequency.placement_scores(letters).tolist()
+            # match_solution, check_possible_word, check_bad_positions and
+            # check_valid_hard_guess for all the remaining words at once
+            word_array = self.get_word_array()
+            state = self.game_state
+            allowed = np.zeros(len(word_array), dtype=bool)
+            allowed[
+                word_array.filter(
+                    GameState(
+                        state.partial_solution,
+                        state.bad_position_dict,
+                        state.good_letters,
+                        possible_bits=state.possible_bits,
+                    ),
+                    exclude=self.guesses,
+                )
+            ] = True
+            if self.hard_mode:
+                allowed &= self.get_legal_guesses().allowed(word_array)
             possible_guesses = sorted(
                 [
-                    (
-                        x,
-                        self.coverage_guess(x),
-                        self.placement_score(x),
-                        self.commonality.get(x, 0),
-                    )
-                    for x in self.remaining_words
-                    if self.match_solution(x)
-                    and self.check_possible_word(x)
-                    and self.check_bad_positions(x)
-                    and x not in self.guesses
-                    and self.check_valid_hard_guess(x)
+                    (x, coverage[j], placement[j], self.commonality.get(x, 0))
+                    for j, x in enumerate(self.remaining_words)
+                    if allowed[j]
                 ],
                 key=lambda x: (-x[1], -x[2]),
             )  # sorting on total coverage tie breaking with placement score
             self.logger.debug(
-                f'this should be the full scored short word list{str(possible_guesses[:10])}'
+                'this should be the full scored short word list%s', possible_guesses[:10]
             )
 
+        self.lap('heuristic')
         if possible_guesses:
             ## zeroing out the other words in a paradox situation
 
             ## TODO clen this up since 'paradox' mode is now the normal model
             matching_short_words = []
-            try_these = [x[0] for x in possible_guesses][: self.top_guess_count]
+            # the exhaustive counterfactual scores every allowed guess, not just a shortlist
+            shortlist = None if exhaustive else self.top_guess_count
+            try_these = [x[0] for x in possible_guesses][:shortlist]
 
-            orig_guess_df = pd.DataFrame(
-                possible_guesses[: self.top_guess_count],
-                columns=['word', 'local_coverage', 'local_placement', 'commonality'],
-            ).set_index('word')
+            orig_guesses = possible_guesses[:shortlist]
             if self.allow_counter_factual and i > 1:
-                if len(self.remaining_words) <= 6:
+                if len(self.remaining_words) <= 6 and not exhaustive:
                     try_these.extend(self.remaining_words)
-                    new_df = pd.DataFrame(
-                        [
-                            [
-                                x,
-                                local_coverage(x),
-                                self.local_placement_score(x, self.remaining_words),
-                                self.commonality.get(x, 0),
-                            ]
-                            for x in self.remaining_words
-                        ],
-                        columns=['word', 'local_coverage', 'local_placement', 'commonality'],
-                    ).set_index('word')
-                    orig_guess_df = pd.concat([orig_guess_df, new_df])
+                    orig_guesses = orig_guesses + [
+                        (
+                            x,
+                            local_coverage(x),
+                            self.local_placement_score(x, self.remaining_words),
+                            self.commonality.get(x, 0),
+                        )
+                        for x in self.remaining_words
+                    ]
                 if augmented_guesses:
                     new_guesses = sorted(
                         list(set(augmented_guesses).difference(set(try_these)))
                     )
-                    self.logger.debug(f'new augmented guesses {new_guesses}')
+                    self.logger.debug('new augmented guesses %s', new_guesses)
 
                     try_these = list(set(try_these + augmented_guesses))
-                    self.logger.debug(f'total augmented length {len(try_these)}')
+                    self.logger.debug('total augmented length %s', len(try_these))
+                if self.hard_mode:
+                    # only legal guesses are worth scoring, whatever suggested them
+                    try_these = [x for x in try_these if self.check_valid_hard_guess(x)]
+                self.count(candidates=len(try_these))
+                self.lap('heuristic')
                 full_data = self.counter_factual_guess(try_these)
-                guess = self.determine_final_guess(full_data, orig_guess_df)
+                self.lap('counterfactual')
+                guess = self.determine_final_guess(full_data, orig_guesses)
+                self.lap('selection')
                 if augmented_guesses:
                     if guess in new_guesses:
-                        self.logger.debug(f'guess {guess} is in augmented guesse')
+                        self.logger.debug('guess %s is in augmented guesse', guess)
                         self.augmented_guess_count += 1
 
                 possible_guesses = [[guess, 0, 0]]
@@ -488,23 +843,66 @@ class Wordle:
         """
         return possible_guesses
 
-    def determine_final_guess(self, counter_factual_data, orig_guess_df):
-        """what statistic should determine the next guess. This uses mean, but
-        argument could be made to alwasy minimize the max"""
-        summary_stats = (
-            counter_factual_data.describe()
-            .T[['mean', 'std', 'max']]
-            .sort_values(['mean', 'std', 'max'])
-        )
-        res_df = orig_guess_df.join(summary_stats).sort_values(
-            ['mean', 'std', 'max', 'commonality', 'local_coverage', 'local_placement'],
-            ascending=[True, True, True, False, False, False],
-        )
-        self.logger.debug(
-            f"Solution reduction stats by word {res_df.head(15).reset_index().to_dict(orient='records')}"
-        )
-
-        return res_df.index[0]
+    def determine_final_guess(self, partitions, orig_guesses):
+        """Rank the shortlisted (word, local_coverage, local_placement, commonality) guesses with
+        self.strategy. The default uses the mean words left, but an argument could be made to
+        always minimize the max (the 'minimax' strategy)."""
+        strategy = get_strategy(self.strategy)
+        rows = [x for x in orig_guesses if x[0] in partitions.position]
+        if not rows:
+            return orig_guesses[0][0]
+        scored = partitions.take([partitions.position[x[0]] for x in rows])
+        tiebreak = {
+            key: np.array([x[k] for x in rows], dtype=float)
+            for k, key in enumerate(['local_coverage', 'local_placement', 'commonality'], 1)
+        }
+        order = strategy.rank(scored, tiebreak)
+        if self.trace is not None or self.logger.isEnabledFor(logging.DEBUG):
+            stats = strategy.stats(scored)
+            top = [
+                {'word': scored.candidates[j], **{k: float(v[j]) for k, v in stats.items()}}
+                for j in order[:15]
+            ]
+            self.logger.debug('Solution reduction stats by word %s', top)
+            if self.trace is not None:
+                self.trace.candidates(top)
+
+        return scored.candidates[order[0]]
+
+    def next_guess(self, i):
+        """compute the guess for round i from the current game state, or take it from the
+        decision cache if one is attached and has already seen this state"""
+        key = None
+        if self.decision_cache is not None:
+            key = decision_key(self, i)
+        if key is not None:
+            guess = self.decision_cache.get(key)
+            self.count(decision_cache='miss' if guess is None else 'hit')
+            if guess is not None:
+                # leave remaining_words where generate_guess would have
+                self.remaining_words = [x[0] for x in self.make_matching_short_words()]
+                self.count(source='decision_cache')
+                return guess
+
+        guess_anagram, guess_word_list = self.generate_guess(i)
+
+        self.logger.debug('%s, %s', guess_word_list[:10], len(guess_word_list))
+        # (guess_word_list, guess_anagram, self.remaining_words)
+        if guess_word_list:
+            guess = guess_word_list[0][0]
+        else:
+            guess = guess_anagram[0][0]
+        if i == 1 and self.force_init_guess:
+            guess = self.force_init_guess
+        if key is not None:
+            self.decision_cache.put(key, guess)
+        return guess
+
+    def load_policy(self, path):
+        """Use a precomputed policy (see policy.py) in play_game. Games it doesn't apply to, or
+        feedback paths it doesn't cover, fall back to computing the guess."""
+        self.policy = Policy.load(path)
+        return self.policy
 
     def play_game(
         self,
@@ -530,20 +928,32 @@ class Wordle:
         if wordle_num:
             self.wordle_num = str(wordle_num)
 
+        policy = self.policy if self.policy is not None and self.policy.applies_to(self) else None
+        metrics, trace = self.metrics, self.trace
+        if metrics is not None:
+            metrics.start_game(self)
+        if trace is not None:
+            trace.start_game(self)
+
         while True:
             i += 1
-            guess_anagram, guess_word_list = self.generate_guess(i)
-
-            self.logger.debug(f'{guess_word_list[:10]}, {len(guess_word_list)}')
-            # (guess_word_list, guess_anagram, self.remaining_words)
-            if guess_word_list:
-                guess = guess_word_list[0][0]
+            if metrics is not None:
+                metrics.start_round(self, i)
+            if trace is not None:
+                trace.start_round(self, i)
+            guess = policy.lookup(self.guesses, self.success_grid) if policy else None
+            if guess is None:
+                guess = self.next_guess(i)
             else:
-                guess = guess_anagram[0][0]
-            if i == 1 and self.force_init_guess:
-                guess = self.force_init_guess
-
-            self.logger.info(f'Guess is **{guess}**')
+                # leave remaining_words where generate_guess would have
+                self.remaining_words = [x[0] for x in self.make_matching_short_words()]
+                self.count(source='policy')
+            if metrics is not None:
+                metrics.end_round(self, guess)
+            if trace is not None:
+                trace.end_round(self, guess)
+
+            self.logger.info('Guess is **%s**', guess)
             out = self.evaluate_round(guess)
             self.final_list_length = len(self.remaining_words)
             self.word_list_length.append(self.final_list_length)
@@ -552,6 +962,10 @@ class Wordle:
                 full_output = self.create_output(i)
 
                 break
+        if metrics is not None:
+            metrics.end_game(self, i)
+        if trace is not None:
+            trace.end_game(self)
         if remove_answer:
             self.short_words.remove(answer)
         return i, guess, full_output, self.luck_factor or self.final_list_length, self.guesses
@@ -569,13 +983,15 @@ class Wordle:
 
 
 class WordNetWordle(Wordle):
+    source_files = Wordle.source_files + ('wordle-dictionary-full.txt',)
+
     def make_word_list(self):
         super().make_word_list()
         more_short_words = list(
             {
                 word
                 for word in wordnet.words()
-                if len(word) == 5 and word.lower() == word and re.match(r'[a-zA-Z]{5}', word)
+                if self.is_word(word)
             }
         )
 
@@ -614,6 +1030,10 @@ class WordNetWordle2(WordNetWordle):
     """This is the default class for the twitter bot for now."""
 
     top_guess_count = 40
+    source_files = WordNetWordle.source_files + (
+        'wordlist_nyt20220830_all.txt',
+        'glove_five_letter_common.csv',
+    )
 
     def make_word_list(self):
         super().make_word_list()
@@ -637,22 +1057,64 @@ class WordNetWordle2(WordNetWordle):
 
 
 class WordNetMinMix(WordNetWordle2):
-    def determine_final_guess(self, counter_factual_data, orig_guess_df):
-        """what statistic should determine the next guess. This mins the max"""
-        summary_stats = (
-            counter_factual_data.describe()
-            .T[['mean', 'std', 'max']]
-            .sort_values(['mean', 'std', 'max'])
-        )
-        res_df = orig_guess_df.join(summary_stats).sort_values(
-            ['max', 'std', 'mean', 'local_coverage', 'local_placement'],
-            ascending=[True, True, True, False, False],
-        )
-        self.logger.debug(
-            f"Solution reduction stats by word {res_df.head(10).reset_index().to_dict(orient='records')}"
-        )
+    """WordNetWordle2 minimizing the max words left instead of the mean"""
+
+    strategy = 'minimax'
 
-        return res_df.index[0]
+
+class OptimalWordle(WordNetWordle2):
+    """Plays the optimal guess tree for target_words, guessing from short_words: the fewest guesses
+    on average, or with objective = 'worst_case' the fewest in the worst case. The tree is searched
+    exactly (see optimal.py), which is only practical for a few hundred target words. In hard mode
+    it only guesses words still legal after the feedback so far. Use
+    optimal.build_optimal_policy to work it out once for load_policy."""
+
+    objective = 'expected'
+    search = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop('search', None)
+        return state
+
+    def get_search(self):
+        """the branch and bound search, whose memoized subproblems are kept across games"""
+        if (
+            self.search is None
+            or self.search.objective != self.objective
+            or self.search.hard_mode != bool(self.hard_mode)
+            or self.search.guesses != self.short_words
+            or self.search.answers != self.target_words
+        ):
+            self.search = OptimalSearch(
+                self.get_pattern_matrix(),
+                self.short_words,
+                self.target_words,
+                self.objective,
+                hard_mode=bool(self.hard_mode),
+                alphabet=self.alphabet,
+            )
+        return self.search
+
+    def consistent_answers(self):
+        """the target words that would have given exactly the feedback so far"""
+        answers = np.array(self.target_words)
+        patterns = self.get_pattern_matrix()
+        for guess, line in zip(self.guesses, self.success_grid):
+            answers = answers[patterns.submatrix([guess], answers)[0] == line_to_code(line)]
+        return answers.tolist()
+
+    def next_guess(self, i):
+        self.remaining_words = self.consistent_answers()
+        self.lap('filter')
+        if i == 1 and self.force_init_guess:
+            return self.force_init_guess
+        search = self.get_search()
+        # in hard mode only the guesses the feedback so far leaves legal
+        constraints = search.constraints(self.partial_solution, self.good_letters)
+        guess = search.best_guess(self.remaining_words, constraints)
+        self.lap('selection')
+        return guess
 
 
 class WordleR(Wordle):
@@ -662,118 +1124,287 @@ class WordleR(Wordle):
 
     """
 
+    source_files = Wordle.source_files + ('sorted_list.csv',)
+
     def __init__(self, log_level='DEBUG', backtest=False, log_file=None, n=3000):
         self.n_words = n
 
         super().__init__(log_level, backtest, log_file)
 
+    def artifact_params(self):
+        return {**super().artifact_params(), 'n': self.n_words}
+
     def make_word_list(self):
         all_words = pd.read_csv('sorted_list.csv', sep=';')['word']
         if (n := self.n_words) is None:
             n = len(all_words)
 
-        self.target_words = pd.read_csv('sorted_list.csv', sep=';')['word'].head(n).tolist()
-        self.short_words = pd.read_csv('sorted_list.csv', sep=';')['word'].head(n).tolist()
+        self.target_words = all_words.head(n).tolist()
+        self.short_words = list(self.target_words)
+
+    def cutoff(self, n):
+        """The WordleR for the first n words, made from this one rather than from the word list:
+        the words are a prefix of this solver's and their feedback codes are sliced from its
+        pattern matrix, so a sweep over many cutoffs only loads and computes the largest."""
+        if n > len(self.target_words):
+            raise ValueError(f'cutoff {n} is more than the {len(self.target_words)} words loaded')
+        solver = copy(self)
+        solver.n_words = n
+        solver.target_words = self.target_words[:n]
+        solver.short_words = self.short_words[:n]
+        # tables of the full word list, built again for the prefix on first use
+        for key in (
+            'word_array',
+            'word_codes',
+            'guess_array',
+            'legal_guesses',
+            'letter_counts',
+            'frequency_counts',
+            'pool',
+        ):
+            solver.__dict__.pop(key, None)
+        solver.make_frequency_series()
+        solver.make_commonality_lookup()
+        solver.pattern_matrix = self.get_pattern_matrix().subset(
+            solver.short_words, solver.target_words
+        )
+        return solver
 
 
 class Primel(Wordle):
     """for the primel game here: https://converged.yt/primel/"""
 
+    alphabet = '0123456789'
+    source_files = Wordle.source_files + ('primes-to-100k.txt',)
+
     def make_word_list(self):
         primes = pd.read_csv('primes-to-100k.txt', header=None)[0].astype(str)
-        prime_list = [x for x in primes if len(x) == 5]
+        prime_list = [x for x in primes if len(x) == self.word_length]
         self.target_words = self.short_words = prime_list
 
-    def make_frequency_series(self):
-        self.score_dict = {
-            letter: sum([letter in word for word in self.target_words])
-            for letter in '0123456789'
-        }
-        letter_rank_series = pd.Series(self.score_dict).sort_values(ascending=False)
-        self.letter_rank_df = pd.DataFrame(
-            letter_rank_series, columns=['frequency']
-        ).reset_index()
-        self.placement_counter = {
-            i: dict(Counter([word[i] for word in self.target_words])) for i in range(5)
-        }
 
-    def init_game(
+class WordleVariant(Wordle):
+    """Any word length and alphabet from plain word lists, one word per line: the allowed
+    guesses in words_file and the possible answers in answers_file (all the words if None).
+    The alphabet defaults to the letters the words use.
+
+    w = WordleVariant('six_letter_words.txt', length=6)
+    """
+
+    def __init__(
         self,
-        answer,
-        guess_valid_only=False,
-        force_init_guess=None,
-        allow_counter_factual=False,
+        words_file,
+        answers_file=None,
+        length=None,
+        alphabet=None,
+        log_level='DEBUG',
+        backtest=False,
+        log_file=None,
+        hard_mode=False,
     ):
-        super().init_game(answer, guess_valid_only, force_init_guess, allow_counter_factual)
-        self.possible_letters = list('0123456789')
+        self.words_file = words_file
+        self.answers_file = answers_file
+        self.source_files = Wordle.source_files + tuple(x for x in (words_file, answers_file) if x)
+        words = self.read_words(words_file)
+        self.word_length = length or len(words[0])
+        self.alphabet = alphabet or ''.join(
+            sorted({x for word in words if len(word) == self.word_length for x in word})
+        )
+        super().__init__(log_level, backtest, log_file, hard_mode)
+
+    def artifact_params(self):
+        return {
+            **super().artifact_params(),
+            'words_file': self.words_file,
+            'answers_file': self.answers_file,
+            'length': self.word_length,
+            'alphabet': self.alphabet,
+        }
+
+    @staticmethod
+    def read_words(path):
+        with open(path) as f:
+            return [x.strip().lower() for x in f if x.strip()]
+
+    def make_word_list(self):
+        self.short_words = sorted({x for x in self.read_words(self.words_file) if self.is_word(x)})
+        if self.answers_file is None:
+            self.target_words = list(self.short_words)
+        else:
+            self.target_words = sorted(
+                {x for x in self.read_words(self.answers_file) if self.is_word(x)}
+            )
 
 
 class WordNetWordle3(WordNetWordle2):
     """An even slower subclass which doesn't just computer the mean number of remaining words after each possible guess
     but plays a naive game to the end and computes stats based on the final score. Unclear if it outperforms its parent class yet
-    as it is so much slower testing will take a while."""
-
-    def counter_factual_check(self, hypothetical_answer, limited_word_list):
-        res = []
-        for word in set(limited_word_list).difference(self.guesses):
-            #   print(
-            #       f"TEsting guess {word} against hypothetical answer {hypothetical_answer}"
-            #   )
-            full_res = {}
-            w = CounterFactual(
-                deepcopy({key: val for key, val in self.__dict__.items() if key != 'v'}),
-                hypothetical_answer,
+    as it is so much slower testing will take a while.
+
+    The naive games are played as trees rather than one by one: hypothetical answers that get the same
+    feedback reach the same state and share every guess from there on, and candidates are dropped as
+    soon as they can no longer beat the best one found so far."""
+
+    # (round id, CounterFactual, its starting snapshot, naive_scores memo) of the current
+    # round's rollouts
+    rollouts = None
+
+    def naive_scores(self, w, answers, i, scores, limit=None, memo=None):
+        """The round each of answers is found in when w plays on naively from its state (as
+        play_game with allow_counter_factual=False would from round i), added to scores. Returns
+        None as soon as any answer is known to need more than limit rounds.
+
+        Answers that got the same feedback for the same set of guesses are in the same state
+        whatever order the guesses came in, so finished games are kept in memo by the guesses,
+        the answers and the round, and reused when another candidate gets there."""
+        key = None
+        if memo is not None:
+            key = (frozenset(w.guesses), frozenset(answers), i)
+            found = memo.get(key)
+            if found is not None:
+                if limit is not None and max(found.values()) > limit:
+                    return None
+                scores.update(found)
+                return scores
+        if limit is not None and i > limit:
+            return None
+        guess = w.next_guess(i)
+        state = snapshot(w)
+        found = {}
+        for code, group in split_answers(w, guess, answers):
+            if code == w.spec.winning_code:
+                found[group[0]] = i
+                continue
+            play_feedback(w, state, guess, group[0])
+            if self.naive_scores(w, group, i + 1, found, limit, memo) is None:
+                return None
+        if key is not None:
+            memo[key] = found
+        scores.update(found)
+        return scores
+
+    def rollout_candidate(self, w, start, word, answers, best, memo=None):
+        """worst case words left and final score for word over answers, or just a lower bound on
+        the final score (with pruned set) once word can't beat best. memo is naive_scores'."""
+        row = {'word': word, 'words_left': 0, 'final_score': 0, 'pruned': False}
+        # the words left are known before playing anything, and make a tighter limit possible
+        branches = []
+        for code, group in split_answers(w, word, answers):
+            if code == w.spec.winning_code:
+                continue
+            play_feedback(w, start, word, group[0])
+            row['words_left'] = max(row['words_left'], len(w.make_matching_short_words()))
+            branches.append((group, snapshot(w)))
+
+        limit = None
+        if best is not None:
+            limit = best['final_score']
+            if (row['words_left'], word) > (best['words_left'], best['word']):
+                limit -= 1
+        # the biggest groups take the longest, so they decide the worst case soonest
+        for group, state in sorted(branches, key=lambda x: -len(x[0])):
+            for key, val in state.items():
+                setattr(w, key, val)
+            scores = self.naive_scores(w, group, 1, {}, limit, memo)
+            if scores is None:
+                row['final_score'] = max(row['final_score'], limit + 1)
+                row['pruned'] = True
+                break
+            row['final_score'] = max(row['final_score'], *scores.values())
+        return row
+
+    def determine_final_guess(self, counter_factual_data, orig_guesses):
+        """what statistic should determine the next guess. This mins the max final score, then
+        the max words left, then takes the first word alphabetically. The rollouts decide, so
+        any strategy but the default is refused rather than ignored."""
+        if get_strategy(self.strategy).name != 'mean':
+            raise ValueError(
+                f'{type(self).__name__} ranks guesses by rollouts, not strategy {self.strategy!r}'
             )
-            out = w.evaluate_round(word)
-            if out == 'Winner':
-                full_res['words_left'] = 0
-            else:
-                full_res['words_left'] = len(w.make_matching_short_words())
-            if word == hypothetical_answer:
-                score = 0
-            else:
-                w.allow_counter_factual = False
-                score, _, _, _, _ = w.play_game(
-                    hypothetical_answer,
-                    allow_counter_factual=False,
-                )
-            full_res['final_score'] = score
-            full_res['word'] = word
-            full_res['hypothetical_answer'] = hypothetical_answer
-            res.append(full_res)
-        return res
-
-    def determine_final_guess(self, counter_factual_data, orig_guess_df):
-        """what statistic should determine the next guess. This mins the max"""
-        res_df = (
-            counter_factual_data.groupby('word')[['words_left', 'final_score']]
-            .max()
-            .sort_values(['final_score', 'words_left'])
-        )
-        self.logger.debug(
-            f"Solution reduction stats by word {res_df.head(10).reset_index().to_dict(orient='records')}"
-        )
-
-        return res_df.index[0]
+        words = counter_factual_data['word'].to_numpy()
+        words_left = counter_factual_data['words_left'].to_numpy()
+        final_score = counter_factual_data['final_score'].to_numpy()
+        order = np.lexsort((words, words_left, final_score))
+        if self.trace is not None or self.logger.isEnabledFor(logging.DEBUG):
+            top = [
+                {
+                    'word': words[j],
+                    'words_left': int(words_left[j]),
+                    'final_score': int(final_score[j]),
+                }
+                for j in order[:10]
+            ]
+            self.logger.debug('Solution reduction stats by word %s', top)
+            if self.trace is not None:
+                self.trace.candidates(top)
+
+        return words[order[0]]
+
+    def rollout_context(self, round_id, answers):
+        """(CounterFactual, its starting snapshot, naive_scores memo) for the rollouts of
+        round_id, made once per round in each process and shared by every candidate"""
+        if self.rollouts is None or self.rollouts[0] != round_id:
+            # built once per process, the CounterFactual shares them
+            self.get_word_codes()
+            w = CounterFactual(self.counter_factual_state(), answers[0])
+            w.allow_counter_factual = False
+            self.rollouts = (round_id, w, snapshot(w), {})
+        return self.rollouts[1:]
+
+    def rollout_check(self, word, answers, best, round_id):
+        """rollout_candidate for word from the round's state, on a pool worker"""
+        w, start, memo = self.rollout_context(round_id, answers)
+        return self.rollout_candidate(w, start, word, answers, best, memo)
 
     def counter_factual_guess(self, top_guess_candidates):
-        out = []
-        # for word, _, _ in self.make_matching_short_words():
-        #    out.append(self.counter_factual_check(word, top_guess_candidates))
-
-        myfunc = partial(self.counter_factual_check, limited_word_list=top_guess_candidates)
-        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
-            out = list(
-                tqdm(
-                    executor.map(
-                        myfunc, [word for word, _, _ in self.make_matching_short_words()]
-                    ),
-                    total=len(self.make_matching_short_words()),
+        """The worst case words left and naive game length for each candidate, over every
+        remaining word as the hypothetical answer. Candidates with the smallest worst feedback
+        group are tried first to find a good one early. With max_workers > 1 the first one is
+        played here and the rest across the solver's pool, pruned against the first."""
+        hypothetical_answers = [x[0] for x in self.make_matching_short_words()]
+        candidates = sorted(set(top_guess_candidates).difference(self.guesses))
+        codes = self.get_pattern_matrix().submatrix(candidates, hypothetical_answers)
+        order = sorted(range(len(candidates)), key=lambda j: np.bincount(codes[j]).max())
+        round_id = next(_rollout_rounds)
+        w, start, memo = self.rollout_context(round_id, hypothetical_answers)
+
+        rows, best = [], None
+        if self.max_workers > 1 and len(candidates) > 2:
+            best = self.rollout_candidate(
+                w, start, candidates[order[0]], hypothetical_answers, None, memo
+            )
+            pool = self.get_pool()
+            rows = [best] + list(
+                pool.map(
+                    self,
+                    'rollout_check',
+                    [candidates[j] for j in order[1:]],
+                    answers=hypothetical_answers,
+                    best=best,
+                    round_id=round_id,
                 )
             )
-
-        full_stats = pd.concat([pd.DataFrame(x) for x in out])
+            self.count(
+                worker_tasks=pool.last_map['tasks'],
+                worker_utilization=pool.last_map['utilization'],
+            )
+        for j in order[len(rows) :]:
+            row = self.rollout_candidate(
+                w, start, candidates[j], hypothetical_answers, best, memo
+            )
+            rows.append(row)
+            if not row['pruned'] and (
+                best is None
+                or (row['final_score'], row['words_left'], row['word'])
+                < (best['final_score'], best['words_left'], best['word'])
+            ):
+                best = row
+        self.logger.debug(
+            '%s of %s candidates pruned from the rollouts',
+            sum(x['pruned'] for x in rows),
+            len(rows),
+        )
 
         self.logger.setLevel(self.log_level)
 
-        return full_stats
+        return pd.DataFrame(rows, columns=['word', 'words_left', 'final_score', 'pruned'])